@@ -0,0 +1,106 @@
+import io
+import time
+import base64
+import asyncio
+from typing import Any, Callable, Optional, Awaitable
+from concurrent.futures import ThreadPoolExecutor
+
+from gsuid_core.logger import logger
+from gsuid_core.models import Event
+from gsuid_core.server import on_core_shutdown
+
+# 等待单张图片绘制加编码结果的总超时（秒）。绘制函数是 XutheringWavesUID 的协程，只能在事件循环中运行，
+# 超时只在其等待 IO 时生效，无法打断同步的绘图计算，因此不能作为事件循环卡顿的上限；
+# 卡顿由 MAX_PENDING_RENDERS 限制同时进行的绘制数量来控制
+RENDER_TIMEOUT = 20
+RENDER_WORKERS = 2
+# 同时进行中的渲染数量上限，超出时直接发送无图邮件
+MAX_PENDING_RENDERS = 4
+# XutheringWavesUID 导入失败后，间隔该秒数再重试导入
+IMPORT_RETRY_SECONDS = 300
+
+# PIL 编码 PNG 时会释放 GIL，使用线程池即可避免编码阻塞事件循环
+_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="RoverReminderRender")
+_pending = 0
+_draw_func: Optional[Callable[..., Awaitable[Any]]] = None
+_import_failed_at: Optional[float] = None
+
+
+def _try_import_wwuid_draw() -> Optional[Callable[..., Awaitable[Any]]]:
+    global _draw_func, _import_failed_at
+    if _draw_func is not None:
+        return _draw_func
+    if _import_failed_at is not None and time.monotonic() - _import_failed_at < IMPORT_RETRY_SECONDS:
+        return None
+    try:
+        from plugins.XutheringWavesUID.XutheringWavesUID.wutheringwaves_stamina.draw_waves_stamina import (
+            _draw_stamina_img,
+        )
+    except Exception:
+        _import_failed_at = time.monotonic()
+        return None
+    _draw_func, _import_failed_at = _draw_stamina_img, None
+    return _draw_func
+
+
+def can_render() -> bool:
+    """XutheringWavesUID 可用且渲染未达上限时返回 True，用于决定是否需要准备绘图数据"""
+    return _pending < MAX_PENDING_RENDERS and _try_import_wwuid_draw() is not None
+
+
+def _encode_png_base64(img: Any) -> str:
+    buff = io.BytesIO()
+    img.save(buff, format="PNG")
+    return base64.b64encode(buff.getvalue()).decode("ascii")
+
+
+async def render_stamina_image(
+    daily_info: Any,
+    account_info: Any,
+    user_id: str,
+    bot_id: str,
+    bot_self_id: str,
+) -> Optional[str]:
+    """调用 XutheringWavesUID 绘制体力图并编码为 base64，失败、超时或繁忙时返回 None
+
+    绘制在事件循环中进行，超时无法中断同步的绘图计算，见 RENDER_TIMEOUT。
+    """
+    global _pending
+
+    draw_func = _try_import_wwuid_draw()
+    if not draw_func or daily_info is None or account_info is None:
+        return None
+    if _pending >= MAX_PENDING_RENDERS:
+        logger.debug("[体力推送·邮件] 图片渲染繁忙，本次发送无图邮件")
+        return None
+
+    ev = Event(
+        user_id=user_id or "",
+        bot_id=bot_id or "roverreminder",
+        bot_self_id=bot_self_id or "",
+        sender={},
+    )
+    _pending += 1
+    deadline = time.monotonic() + RENDER_TIMEOUT
+    try:
+        img = await asyncio.wait_for(
+            draw_func(ev, {"daily_info": daily_info, "account_info": account_info}),
+            timeout=RENDER_TIMEOUT,
+        )
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(_executor, _encode_png_base64, img),
+            timeout=max(0.1, deadline - time.monotonic()),
+        )
+    except asyncio.TimeoutError:
+        logger.debug("[体力推送·邮件] 图片渲染超时，本次发送无图邮件")
+        return None
+    except Exception:
+        return None
+    finally:
+        _pending -= 1
+
+
+@on_core_shutdown
+async def _shutdown_render_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,123 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from gsuid_core.logger import logger
+
+from .smtp_pool import SmtpKey
+
+
+class SmtpProviderConfig(BaseModel):
+    """校验后的发件配置"""
+
+    model_config = ConfigDict(frozen=True)
+
+    provider: str
+    host: str
+    port: int
+    user: str
+    password: str
+    sender: str
+    sender_name: str = ""
+    use_ssl: bool = True
+    starttls: bool = False
+
+    @property
+    def pool_key(self) -> SmtpKey:
+        return (self.host, self.port, self.user, self.password, self.use_ssl, self.starttls)
+
+
+def parse_provider_config(raw: Dict[str, Any]) -> Tuple[Optional[SmtpProviderConfig], str]:
+    provider = raw.get("provider", "smtp")
+    section = raw.get("qq" if provider == "qq" else "smtp", {})
+    config = dict(section) if isinstance(section, dict) else {}
+
+    if provider == "qq":
+        # QQ邮箱：password 使用授权码
+        config.setdefault("host", "smtp.qq.com")
+        config.setdefault("port", 465)
+        config.setdefault("use_ssl", True)
+        if not config.get("password") and config.get("auth_code"):
+            config["password"] = config.get("auth_code")
+
+    host = config.get("host")
+    user = config.get("user")
+    password = config.get("password")
+    if not host or not user or not password:
+        return None, "邮件配置不完整"
+
+    sender = config.get("sender") or user
+    sender_name = config.get("sender_name", "")
+    if sender and "@" not in sender:
+        sender_name = sender
+        sender = user
+
+    try:
+        return (
+            SmtpProviderConfig(
+                provider=provider,
+                host=str(host),
+                port=int(config.get("port", 465)),
+                user=str(user),
+                password=str(password),
+                sender=str(sender),
+                sender_name=str(sender_name or ""),
+                use_ssl=bool(config.get("use_ssl", True)),
+                starttls=bool(config.get("starttls", False)),
+            ),
+            "",
+        )
+    except Exception as e:
+        return None, f"邮件配置错误: {e}"
+
+
+class MailConfigLoader:
+    """按文件修改时间缓存邮件配置，文件变化后自动重新加载"""
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._mtime: Optional[Tuple[int, int]] = None
+        self._raw: Dict[str, Any] = {}
+        self._result: Tuple[Optional[SmtpProviderConfig], str] = (None, "邮件配置不完整")
+        self._lock = threading.Lock()
+
+    def _reload(self, mtime: Optional[Tuple[int, int]]) -> None:
+        raw: Dict[str, Any] = {}
+        if mtime is not None:
+            try:
+                with open(self._path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    raw = data
+            except Exception as e:
+                logger.warning(f"[体力推送·邮件] 邮件配置读取失败: {e}")
+        self._raw = raw
+        self._result = parse_provider_config(raw)
+        self._mtime = mtime
+        config, error = self._result
+        if config:
+            logger.info(f"[体力推送·邮件] 已加载邮件配置 provider={config.provider} host={config.host}")
+        elif mtime is not None:
+            logger.warning(f"[体力推送·邮件] 邮件配置无效: {error}")
+
+    def _check(self) -> None:
+        try:
+            stat = self._path.stat()
+            mtime: Optional[Tuple[int, int]] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime != self._mtime:
+                self._reload(mtime)
+
+    def get_raw(self) -> Dict[str, Any]:
+        self._check()
+        return self._raw
+
+    def get(self) -> Tuple[Optional[SmtpProviderConfig], str]:
+        """返回 (发件配置, 错误信息)，配置无效时发件配置为 None"""
+        self._check()
+        return self._result
@@ -1,30 +1,50 @@
+import time
 import asyncio
-import json
-import smtplib
 from email.header import Header
 from email.message import EmailMessage
 from email.utils import formataddr
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple, Callable, Optional
 
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
+
+from ..utils.metrics import MAIL_SENDS, STAGE_SECONDS, stage_timer
+from ..utils.rate_limit import TokenBucket
 from ..utils.resource.RESOURCE_PATH import MAIN_PATH
+from ..roverreminder_config.roverreminder_config import RoverReminderConfig
+from .smtp_pool import smtp_pool
+from .mail_config import MailConfigLoader, SmtpProviderConfig
 from .template import build_stamina_html
 
 # 全局邮件队列
 _mail_queue: asyncio.Queue = asyncio.Queue()
-_consumer_task: asyncio.Task | None = None
+_worker_tasks: List[asyncio.Task] = []
 _queue_lock = asyncio.Lock()
 
+# 按服务商、收件域名分别限速
+_provider_buckets: Dict[str, TokenBucket] = {}
+_domain_buckets: Dict[str, TokenBucket] = {}
+
+# 收件域名暂无配额、等待稍后放回队列的邮件数
+_deferred_count = 0
+
+_queue_stats: Dict[str, float] = {
+    "dispatched": 0,
+    "deferred": 0,
+    "wait_total": 0.0,
+    "wait_max": 0.0,
+    "wait_last": 0.0,
+}
+
+# 出队后 should_send 返回 False 时的结果信息，此时邮件未发送
+MAIL_SKIPPED = "邮件已取消发送"
+
 CONFIG_PATH = MAIN_PATH / "mail" / "config.json"
+mail_config_loader = MailConfigLoader(CONFIG_PATH)
 
 
 def get_mail_config() -> Dict[str, Any]:
-    if not CONFIG_PATH.exists():
-        return {}
-    try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    return mail_config_loader.get_raw()
 
 
 def _build_message(sender: str, to_email: str, subject: str, html: str, sender_name: str = "") -> EmailMessage:
@@ -45,72 +65,139 @@ def _build_message(sender: str, to_email: str, subject: str, html: str, sender_n
     return msg
 
 
-def _send_via_smtp(config: Dict[str, Any], to_email: str, subject: str, html: str) -> Tuple[bool, str]:
-    host = config.get("host")
-    port = int(config.get("port", 465))
-    user = config.get("user")
-    password = config.get("password")
-    sender = config.get("sender") or user
-    sender_name = config.get("sender_name", "")
-    if sender and "@" not in sender and user:
-        sender_name = sender
-        sender = user
-    use_ssl = bool(config.get("use_ssl", True))
-    starttls = bool(config.get("starttls", False))
-
-    if not host or not user or not password:
-        return False, "邮件配置不完整"
-
-    msg = _build_message(sender, to_email, subject, html, sender_name=sender_name)
-
+def _send_via_smtp(config: SmtpProviderConfig, to_email: str, subject: str, html: str) -> Tuple[bool, str]:
+    msg = _build_message(config.sender, to_email, subject, html, sender_name=config.sender_name)
     try:
-        if use_ssl:
-            with smtplib.SMTP_SSL(host, port, timeout=10) as server:
-                server.login(user, password)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(host, port, timeout=10) as server:
-                if starttls:
-                    server.starttls()
-                server.login(user, password)
-                server.send_message(msg)
+        smtp_pool.send(config.pool_key, msg)
         return True, "ok"
     except Exception as e:
         return False, str(e)
 
-def _send_via_qq(config: Dict[str, Any], to_email: str, subject: str, html: str) -> Tuple[bool, str]:
-    """QQ邮箱发送：password 使用授权码"""
-    qq_config = dict(config or {})
-    qq_config.setdefault("host", "smtp.qq.com")
-    qq_config.setdefault("port", 465)
-    qq_config.setdefault("use_ssl", True)
-    if not qq_config.get("password") and qq_config.get("auth_code"):
-        qq_config["password"] = qq_config.get("auth_code")
-    return _send_via_smtp(qq_config, to_email, subject, html)
 
+def _get_bucket(buckets: Dict[str, TokenBucket], key: str, rate_per_minute: int, burst: int = 1) -> TokenBucket:
+    rate = max(0, rate_per_minute) / 60
+    capacity = max(1, burst)
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = buckets[key] = TokenBucket(rate, capacity)
+    elif bucket.rate != rate or bucket.capacity != capacity:
+        bucket.set_rate(rate, capacity)
+    return bucket
 
-async def _mail_consumer():
-    """每秒处理一封邮件"""
-    while True:
+
+def _recipient_domain(to_email: str) -> str:
+    return to_email.rsplit("@", 1)[-1].strip().lower()
+
+
+def _domain_rate_overrides(raw: str) -> Dict[str, int]:
+    overrides: Dict[str, int] = {}
+    for item in raw.replace("，", ",").split(","):
+        domain, sep, rate = item.partition("=")
+        if not sep:
+            continue
         try:
-            future, to_email, subject, html, config, provider = await _mail_queue.get()
+            overrides[domain.strip().lower()] = int(rate.strip())
+        except ValueError:
+            logger.warning(f"[体力推送·邮件] 忽略无效的域名速率配置: {item.strip()}")
+    return overrides
 
-            try:
-                if provider == "qq":
-                    success, msg = await asyncio.to_thread(_send_via_qq, config, to_email, subject, html)
-                else:
-                    success, msg = await asyncio.to_thread(_send_via_smtp, config, to_email, subject, html)
 
-                if not future.done():
-                    future.set_result((success, msg))
-            except Exception as e:
-                if not future.done():
-                    future.set_result((False, f"发送失败: {e}"))
+def _domain_rate_per_minute(domain: str) -> int:
+    overrides = _domain_rate_overrides(RoverReminderConfig.get_config("MailDomainRateOverrides").data)
+    if domain in overrides:
+        return overrides[domain]
+    return RoverReminderConfig.get_config("MailDomainRatePerMinute").data
+
+
+def _requeue(item: Tuple) -> None:
+    global _deferred_count
+    _deferred_count -= 1
+    _mail_queue.put_nowait(item)
 
-            await asyncio.sleep(1)  # 速率限制：每秒最多一封
+
+def _defer(item: Tuple, delay: float) -> None:
+    """收件域名暂无配额时稍后放回队列，工作协程继续处理其他域名的邮件"""
+    global _deferred_count
+    _deferred_count += 1
+    _queue_stats["deferred"] += 1
+    asyncio.get_running_loop().call_later(delay, _requeue, item)
+
+
+def get_mail_queue_stats() -> Dict[str, float]:
+    """邮件队列状态：排队数量、已发送数量及排队等待时间（秒）"""
+    dispatched = _queue_stats["dispatched"]
+    return {
+        "queue_depth": _mail_queue.qsize() + _deferred_count,
+        "deferred": _queue_stats["deferred"],
+        "workers": sum(1 for task in _worker_tasks if not task.done()),
+        "dispatched": dispatched,
+        "wait_last": _queue_stats["wait_last"],
+        "wait_max": _queue_stats["wait_max"],
+        "wait_avg": _queue_stats["wait_total"] / dispatched if dispatched else 0.0,
+    }
+
+
+async def _mail_worker():
+    """从队列取出邮件，按服务商和收件域名限速后发送"""
+    while True:
+        try:
+            item = await _mail_queue.get()
+            future, to_email, subject, html, config, enqueued_at, should_send = item
+        except asyncio.CancelledError:
+            raise
         except Exception:
-            # 消费者循环异常，继续运行
             await asyncio.sleep(1)
+            continue
+
+        try:
+            domain = _recipient_domain(to_email)
+            domain_bucket = _get_bucket(_domain_buckets, domain, _domain_rate_per_minute(domain))
+            if not domain_bucket.try_acquire():
+                _defer(item, domain_bucket.time_until_available())
+                continue
+            await _get_bucket(
+                _provider_buckets,
+                config.provider,
+                RoverReminderConfig.get_config("MailRatePerMinute").data,
+                RoverReminderConfig.get_config("MailBurst").data,
+            ).acquire()
+
+            if should_send is not None and not should_send():
+                if not future.done():
+                    future.set_result((False, MAIL_SKIPPED))
+                continue
+
+            wait = time.monotonic() - enqueued_at
+            _queue_stats["dispatched"] += 1
+            _queue_stats["wait_total"] += wait
+            _queue_stats["wait_last"] = wait
+            _queue_stats["wait_max"] = max(_queue_stats["wait_max"], wait)
+            STAGE_SECONDS.observe(wait, stage="queue_wait")
+
+            with stage_timer("smtp"):
+                success, msg = await asyncio.to_thread(_send_via_smtp, config, to_email, subject, html)
+            MAIL_SENDS.inc(provider=config.provider, result="success" if success else "fail")
+
+            if not future.done():
+                future.set_result((success, msg))
+        except asyncio.CancelledError:
+            if not future.done():
+                future.set_result((False, "发送任务已取消"))
+            raise
+        except Exception as e:
+            logger.exception("[体力推送·邮件] 邮件发送异常")
+            if not future.done():
+                future.set_result((False, f"发送失败: {e}"))
+        finally:
+            _mail_queue.task_done()
+
+
+async def _ensure_workers() -> None:
+    workers = max(1, RoverReminderConfig.get_config("MailWorkers").data)
+    async with _queue_lock:
+        _worker_tasks[:] = [task for task in _worker_tasks if not task.done()]
+        while len(_worker_tasks) < workers:
+            _worker_tasks.append(asyncio.create_task(_mail_worker()))
 
 
 async def send_stamina_email(
@@ -124,35 +211,34 @@ async def send_stamina_email(
     user_id: str = "",
     bot_id: str = "",
     bot_self_id: str = "",
+    should_send: Optional[Callable[[], bool]] = None,
 ) -> Tuple[bool, str]:
-    global _consumer_task
-
-    config = get_mail_config()
-    provider = config.get("provider", "smtp")
-
-    subject, html = await build_stamina_html(
-        uid,
-        stamina,
-        threshold,
-        now_text,
-        daily_info,
-        account_info,
-        user_id,
-        bot_id,
-        bot_self_id,
-    )
-
-    # 获取对应提供商的配置
-    if provider == "qq":
-        cfg = config.get("qq", {})
-    else:
-        cfg = config.get("smtp", {})
-
-    async with _queue_lock:
-        if _consumer_task is None or _consumer_task.done():
-            _consumer_task = asyncio.create_task(_mail_consumer())
+    """渲染并排队发送体力提醒邮件，should_send 在即将发送前检查，返回 False 时放弃发送"""
+    config, error = mail_config_loader.get()
+    if config is None:
+        return False, error
+
+    with stage_timer("render"):
+        subject, html = await build_stamina_html(
+            uid,
+            stamina,
+            threshold,
+            now_text,
+            daily_info,
+            account_info,
+            user_id,
+            bot_id,
+            bot_self_id,
+        )
+
+    await _ensure_workers()
 
     future: asyncio.Future[Tuple[bool, str]] = asyncio.Future()
-    await _mail_queue.put((future, to_email, subject, html, cfg, provider))
+    await _mail_queue.put((future, to_email, subject, html, config, time.monotonic(), should_send))
 
     return await future
+
+
+@on_core_shutdown
+async def _close_smtp_pool():
+    await asyncio.to_thread(smtp_pool.close_all)
@@ -0,0 +1,123 @@
+import time
+import smtplib
+import threading
+from email.message import EmailMessage
+from typing import Dict, List, Tuple
+
+# (host, port, user, password, use_ssl, starttls)
+SmtpKey = Tuple[str, int, str, str, bool, bool]
+
+SMTP_TIMEOUT = 10
+# 空闲超过该时间的连接在复用前先发送 NOOP 探测
+PROBE_AFTER_SECONDS = 30
+# 空闲超过该时间的连接直接关闭
+MAX_IDLE_SECONDS = 240
+# 单个连接最多发送的邮件数，避免触发服务商的单连接限制
+MAX_MESSAGES_PER_CONNECTION = 50
+MAX_IDLE_CONNECTIONS = 4
+
+
+class _PooledConnection:
+    def __init__(self, server: smtplib.SMTP) -> None:
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+def _is_retryable(e: Exception) -> bool:
+    """连接断开或 4xx 临时错误时重连后重试一次"""
+    if isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    return False
+
+
+class SmtpPool:
+    """按发件配置复用已登录的 SMTP 连接，send 在工作线程中调用"""
+
+    def __init__(self) -> None:
+        self._idle: Dict[SmtpKey, List[_PooledConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, key: SmtpKey) -> _PooledConnection:
+        host, port, user, password, use_ssl, starttls = key
+        if use_ssl:
+            server: smtplib.SMTP = smtplib.SMTP_SSL(host, port, timeout=SMTP_TIMEOUT)
+        else:
+            server = smtplib.SMTP(host, port, timeout=SMTP_TIMEOUT)
+        try:
+            if not use_ssl and starttls:
+                server.starttls()
+            server.login(user, password)
+        except Exception:
+            server.close()
+            raise
+        return _PooledConnection(server)
+
+    def _acquire(self, key: SmtpKey) -> _PooledConnection:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                return self._connect(key)
+
+            idle_seconds = time.monotonic() - conn.last_used
+            if idle_seconds > MAX_IDLE_SECONDS:
+                conn.close()
+                continue
+            if idle_seconds > PROBE_AFTER_SECONDS:
+                try:
+                    code, _ = conn.server.noop()
+                except Exception:
+                    code = -1
+                if code != 250:
+                    conn.close()
+                    continue
+            return conn
+
+    def _release(self, key: SmtpKey, conn: _PooledConnection) -> None:
+        conn.last_used = time.monotonic()
+        if conn.sent >= MAX_MESSAGES_PER_CONNECTION:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_CONNECTIONS:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def send(self, key: SmtpKey, msg: EmailMessage) -> None:
+        for attempt in range(2):
+            conn = self._acquire(key)
+            try:
+                conn.server.send_message(msg)
+            except Exception as e:
+                conn.close()
+                if attempt == 0 and _is_retryable(e):
+                    continue
+                raise
+            conn.sent += 1
+            self._release(key, conn)
+            return
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+smtp_pool = SmtpPool()
@@ -0,0 +1,71 @@
+import re
+import threading
+from pathlib import Path
+from typing import List, Tuple, Mapping, Optional
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+# 图片为空时去掉 data URI 前缀，与原先 src="data:image/png;base64," -> src="" 的处理一致
+EMPTY_IMAGE_PREFIX = 'src="data:image/png;base64,'
+
+
+class CompiledTemplate:
+    """预先切分好的模板片段，渲染时只做一次拼接"""
+
+    def __init__(self, source: str) -> None:
+        parts = PLACEHOLDER_PATTERN.split(source)
+        self._literals: List[str] = parts[0::2]
+        self._names: List[str] = parts[1::2]
+        # 每个占位符值为空时使用的前一片段，None 表示无需处理
+        self._empty_literals: List[Optional[str]] = []
+        for i in range(len(self._names)):
+            before, after = self._literals[i], self._literals[i + 1]
+            if before.endswith(EMPTY_IMAGE_PREFIX) and after.startswith('"'):
+                self._empty_literals.append(before[: -len(EMPTY_IMAGE_PREFIX)] + 'src="')
+            else:
+                self._empty_literals.append(None)
+        self.names = frozenset(self._names)
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """未提供值的占位符原样保留"""
+        out: List[str] = []
+        for i, name in enumerate(self._names):
+            literal = self._literals[i]
+            if name not in values:
+                out.append(literal)
+                out.append("{{" + name + "}}")
+                continue
+            value = values[name]
+            empty_literal = self._empty_literals[i]
+            out.append(empty_literal if not value and empty_literal is not None else literal)
+            out.append(value)
+        out.append(self._literals[-1])
+        return "".join(out)
+
+
+class TemplateCache:
+    """按文件修改时间缓存编译后的模板，文件不存在或为空时使用默认模板"""
+
+    def __init__(self, path: Path, default_template: str) -> None:
+        self._path = path
+        self._default = CompiledTemplate(default_template)
+        self._mtime: Optional[Tuple[int, int]] = None
+        self._compiled: Optional[CompiledTemplate] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> CompiledTemplate:
+        try:
+            stat = self._path.stat()
+        except OSError:
+            return self._default
+        mtime = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if self._compiled is not None and self._mtime == mtime:
+                return self._compiled
+            try:
+                source = self._path.read_text(encoding="utf-8")
+            except Exception:
+                source = ""
+            self._compiled = CompiledTemplate(source) if source else self._default
+            self._mtime = mtime
+            return self._compiled
@@ -5,8 +5,9 @@ from gsuid_core.logger import logger
 from gsuid_core.models import Event
 from gsuid_core.sv import SV, get_plugin_available_prefix
 
-from ..utils.database.models import WavesBind, WavesStaminaRecord
 from ..utils.api.requests import waves_api
+from ..utils.record_hooks import notify_record_changed
+from ..utils.database.models import WavesBind, WavesStaminaRecord
 from .roverreminder_config import RoverReminderConfig
 
 sv_rover_reminder = SV("RoverReminder配置")
@@ -28,6 +29,9 @@ async def switch_push(bot: Bot, ev: Event):
         return await bot.send((" " if at_sender else "") + msg, at_sender)
 
     ck = await waves_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+    if ck is None:
+        msg = "库街区接口暂时不可用，请稍后再试"
+        return await bot.send((" " if at_sender else "") + msg, at_sender)
     try:
         await WavesStaminaRecord.update_ck_valid(
             user_id=ev.user_id,
@@ -84,6 +88,7 @@ async def switch_push(bot: Bot, ev: Event):
             uid=uid,
             stamina_push_switch="off"
         )
+    await notify_record_changed(ev.user_id, ev.bot_id, uid)
 
     msg = f"uid {uid} 已开启体力推送！{auto_email_msg}" if enable else f"uid {uid} 已关闭体力推送！"
     await bot.send((" " if at_sender else "") + msg, at_sender)
@@ -106,6 +111,9 @@ async def set_push_email(bot: Bot, ev: Event):
         return await bot.send((" " if at_sender else "") + msg, at_sender)
 
     ck = await waves_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+    if ck is None:
+        msg = "库街区接口暂时不可用，请稍后再试"
+        return await bot.send((" " if at_sender else "") + msg, at_sender)
     if not ck:
         msg = f"uid {uid} 登录状态无效！无法查询！"
         return await bot.send((" " if at_sender else "") + msg, at_sender)
@@ -123,6 +131,7 @@ async def set_push_email(bot: Bot, ev: Event):
         logger.exception("[体力推送·配置] 设置邮箱失败")
         msg = f"uid {uid} 邮箱设置失败，请稍后重试"
         return await bot.send((" " if at_sender else "") + msg, at_sender)
+    await notify_record_changed(ev.user_id, ev.bot_id, uid)
 
     msg = f"uid {uid} 邮箱设置成功"
     return await bot.send((" " if at_sender else "") + msg, at_sender)
@@ -147,6 +156,9 @@ async def set_push_threshold(bot: Bot, ev: Event):
         return await bot.send((" " if at_sender else "") + msg, at_sender)
 
     ck = await waves_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+    if ck is None:
+        msg = "库街区接口暂时不可用，请稍后再试"
+        return await bot.send((" " if at_sender else "") + msg, at_sender)
     if not ck:
         msg = f"uid {uid} 登录状态无效，请重新登录后再设置阈值"
         return await bot.send((" " if at_sender else "") + msg, at_sender)
@@ -158,5 +170,6 @@ async def set_push_threshold(bot: Bot, ev: Event):
         uid=uid,
         stamina_threshold=value,
     )
+    await notify_record_changed(ev.user_id, ev.bot_id, uid)
     msg = f"uid {uid} 体力阈值已设置为 {value}"
     return await bot.send((" " if at_sender else "") + msg, at_sender)
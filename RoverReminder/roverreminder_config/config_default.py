@@ -1,6 +1,6 @@
 from typing import Dict
 
-from gsuid_core.utils.plugins_config.models import GSC, GsBoolConfig, GsIntConfig
+from gsuid_core.utils.plugins_config.models import GSC, GsStrConfig, GsBoolConfig, GsIntConfig
 
 CONFIG_DEFAULT: Dict[str, GSC] = {
     "EnableStaminaPush": GsBoolConfig(
@@ -20,4 +20,114 @@ CONFIG_DEFAULT: Dict[str, GSC] = {
         42,
         10000,
     ),
+    "ApiMaxConnections": GsIntConfig(
+        "请求最大连接数",
+        "库街区请求连接池允许的最大连接数",
+        20,
+        200,
+    ),
+    "ApiMaxKeepalive": GsIntConfig(
+        "请求最大保活连接数",
+        "库街区请求连接池中保持复用的空闲连接数",
+        10,
+        200,
+    ),
+    "ApiConnectTimeout": GsIntConfig(
+        "请求连接超时",
+        "建立库街区连接的超时时间（秒）",
+        5,
+        60,
+    ),
+    "ApiReadTimeout": GsIntConfig(
+        "请求读取超时",
+        "等待库街区响应的超时时间（秒）",
+        10,
+        120,
+    ),
+    "ApiHttp2": GsBoolConfig(
+        "请求启用HTTP/2",
+        "需要安装h2依赖，未安装时自动使用HTTP/1.1",
+        False,
+    ),
+    "ApiMaxRps": GsIntConfig(
+        "接口请求速率上限",
+        "每秒最多请求库街区接口的次数，遇到风控或服务端错误时自动降低，0为不限制",
+        10,
+        100,
+    ),
+    "ApiBreakerSeconds": GsIntConfig(
+        "接口熔断时间",
+        "接口连续异常后暂停请求的秒数，再次熔断时翻倍",
+        60,
+        3600,
+    ),
+    "CookieCacheMinutes": GsIntConfig(
+        "登录状态校验缓存时间",
+        "登录状态校验通过后在此时间内（分钟）不再重复校验，0为不缓存",
+        30,
+        1440,
+    ),
+    "BaseInfoCacheHours": GsIntConfig(
+        "账号信息缓存时间",
+        "账号名称、等级等基础信息的缓存时间（小时），仅在发送带图邮件时请求，0为不缓存",
+        24,
+        168,
+    ),
+    "PushConcurrency": GsIntConfig(
+        "推送检查并发数",
+        "同时处理的到期记录数量",
+        4,
+        32,
+    ),
+    "MailWorkers": GsIntConfig(
+        "邮件发送并发数",
+        "同时发送邮件的工作协程数量，单封邮件SMTP耗时约0.5~1秒，吞吐量约为 并发数/单封耗时，需与服务商速率一同调整",
+        4,
+        16,
+    ),
+    "MailRatePerMinute": GsIntConfig(
+        "邮件服务商发送速率",
+        "每个邮件服务商每分钟最多发送的邮件数，0为不限制；按服务商的发信额度设置，过高可能触发服务商限流",
+        300,
+        6000,
+    ),
+    "MailBurst": GsIntConfig(
+        "邮件服务商突发数量",
+        "每个邮件服务商允许连续发送而不等待的邮件数，积压时可快速发出一批，最小为1",
+        10,
+        100,
+    ),
+    "MailDomainRatePerMinute": GsIntConfig(
+        "收件域名发送速率",
+        "发往同一收件域名每分钟最多的邮件数，0为不限制；对单个收件域名的单独限速见下一项",
+        120,
+        6000,
+    ),
+    "MailDomainRateOverrides": GsStrConfig(
+        "指定域名发送速率",
+        "单独设置部分收件域名每分钟最多的邮件数，格式为 域名=数量，多个用逗号分隔；qq.com 对集中发信较敏感，默认单独限制为每分钟60封",
+        "qq.com=60",
+    ),
+    "KuroApiBaseUrl": GsStrConfig(
+        "库街区接口地址",
+        "留空使用官方地址，仅在对接本地模拟器测试时修改，如 http://127.0.0.1:8765",
+        "",
+    ),
+    "MetricsTextfile": GsBoolConfig(
+        "输出监控指标文件",
+        "定期将运行指标以Prometheus文本格式写入插件数据目录下的metrics.prom，供node_exporter textfile采集",
+        False,
+    ),
+    "MetricsHttpPort": GsIntConfig(
+        "监控指标端口",
+        "在127.0.0.1的该端口提供/metrics接口，0为关闭，修改后需重启生效",
+        0,
+        65535,
+    ),
+    "ScanShardCount": GsIntConfig(
+        "扫描分片数",
+        "多个实例共用同一数据库时按uid分片，各实例通过数据库租约认领分片，实例需设置相同的值，0为单实例不分片",
+        0,
+        256,
+    ),
 }
@@ -1,30 +1,66 @@
 import asyncio
 import time
 from datetime import datetime
-from typing import Dict, Optional
+from collections import Counter
+from typing import Dict, List, Optional
 
 from gsuid_core.aps import scheduler
 from gsuid_core.logger import logger
 from gsuid_core.models import Event
+from gsuid_core.server import on_core_start
 
 from ..utils.api.model import AccountBaseInfo, DailyData
 from ..utils.api.request_util import KuroApiResp
 from ..utils.api.requests import waves_api
-from ..utils.database.models import WavesStaminaRecord
+from ..utils.api.retry import request_deadline
+from ..utils.constants import WAVES_GAME_ID
+from ..utils.database.models import WavesUser, WavesStaminaRecord
+from ..utils.database.write_buffer import write_behind, update_stamina_record
+from ..utils.metrics import API_CALLS, stage_timer, record_scan_cycle
+from ..utils.record_hooks import on_record_changed
 from ..utils.mail_logger import get_mail_logger
 from ..utils.status_store import record_fail, record_success
-from ..utils.database.waves_user_activity import WavesUserActivity
+from ..utils.database.waves_user_activity import ActivityKey, WavesUserActivity
 from ..roverreminder_config.roverreminder_config import RoverReminderConfig
+from .shard_lease import LEASE_RENEW_SECONDS, shard_leases
+from .due_scheduler import (
+    RecordKey,
+    record_key,
+    due_scheduler,
+    calc_due_time,
+    get_cooldown_hours,
+    get_push_threshold,
+)
 
 mail_logger = get_mail_logger()
 _check_lock = asyncio.Lock()
+_loop_task: Optional[asyncio.Task] = None
+# 认领到新分片后由调度循环在当前批次结束后同步检查计划，续期任务不等待检查锁
+_resync_requested = False
+
+# 查询失败等情况下的重试间隔，与原轮询周期一致
+RETRY_INTERVAL = 360
+# 不活跃账号的复查间隔
+INACTIVE_RECHECK_INTERVAL = 3600
+# 队列为空时的最长休眠时间
+MAX_IDLE_SECONDS = 600
+# process_uid 因熔断、网络异常未能确认登录状态时的返回值，区别于 CK 失效
+API_UNAVAILABLE = "api_unavailable"
+# 单条记录所有接口请求（含重试）的总时长上限
+RECORD_API_DEADLINE = 20
+# 全量同步周期，同步时只加载冷却将在下次同步前结束的记录
+RESYNC_INTERVAL = 3600
 
 
 async def process_uid(uid, ev):
-    ck = await waves_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+    with stage_timer("ck"):
+        ck = await waves_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+    if ck is None:
+        # 接口不可用时无法判断登录状态，不能记为 CK 失效
+        return API_UNAVAILABLE
     if not ck:
         try:
-            await WavesStaminaRecord.update_ck_valid(
+            await update_stamina_record(
                 user_id=ev.user_id,
                 bot_id=ev.bot_id,
                 bot_self_id=ev.bot_self_id or "",
@@ -35,25 +71,20 @@ async def process_uid(uid, ev):
             logger.exception("[体力推送·鸣潮每日信息] 体力记录CK有效状态更新失败")
         return None
 
-    results = await asyncio.gather(
-        waves_api.get_daily_info(uid, ck),
-        waves_api.get_base_info(uid, ck),
-        return_exceptions=True,
-    )
-
-    (daily_info_res, account_info_res) = results
-    if not isinstance(daily_info_res, KuroApiResp) or not daily_info_res.success:
+    try:
+        with stage_timer("daily_fetch"):
+            daily_info_res = await waves_api.get_daily_info(uid, ck)
+    except Exception:
+        logger.exception(f"[体力推送·鸣潮每日信息] 每日信息获取失败 uid={uid}")
         return None
-
-    if not isinstance(account_info_res, KuroApiResp) or not account_info_res.success:
+    if not isinstance(daily_info_res, KuroApiResp) or not daily_info_res.success:
         return None
 
     daily_info = DailyData.model_validate(daily_info_res.data)
-    account_info = AccountBaseInfo.model_validate(account_info_res.data)
 
     try:
         mr_value = daily_info.energyData.cur if daily_info.energyData else None
-        await WavesStaminaRecord.upsert_stamina_query(
+        await update_stamina_record(
             user_id=ev.user_id,
             bot_id=ev.bot_id,
             bot_self_id=ev.bot_self_id or "",
@@ -65,12 +96,30 @@ async def process_uid(uid, ev):
     except Exception:
         logger.exception("[体力推送·鸣潮每日信息] 体力查询记录写入失败")
 
+    # 账号基础信息只在发送带图邮件时按需获取，见 _load_account_info
     return {
         "daily_info": daily_info,
-        "account_info": account_info,
+        "ck": ck,
     }
 
 
+async def _load_account_info(uid: str, ck: str) -> Optional[AccountBaseInfo]:
+    try:
+        with stage_timer("base_fetch"):
+            return await waves_api.get_account_base_info(uid, ck)
+    except Exception:
+        logger.exception(f"[体力推送·鸣潮每日信息] 账号基础信息获取失败 uid={uid}")
+        return None
+
+
+def _unavailable_reason(record: WavesStaminaRecord) -> str:
+    if waves_api.scan_blocked_for() > 0:
+        logger.debug(f"[体力推送·推送] uid={record.uid} 接口熔断中，推迟检查")
+        return "circuit_open"
+    logger.debug(f"[体力推送·推送] uid={record.uid} 接口暂不可用，未发送邮件")
+    return "api_failed"
+
+
 def _calc_current_stamina(record: WavesStaminaRecord, now_ts: int) -> Optional[int]:
     if record.mr_query_time is None or record.mr_value is None:
         return None
@@ -81,51 +130,76 @@ def _calc_current_stamina(record: WavesStaminaRecord, now_ts: int) -> Optional[i
 def _should_try_send(record: WavesStaminaRecord, threshold: int, now_ts: int) -> bool:
     if record.email_last_success_time is None:
         return True
-    cooldown_hours = max(1, threshold // 10 - 1)
+    cooldown_hours = get_cooldown_hours(threshold)
     return (now_ts - record.email_last_success_time) >= cooldown_hours * 3600
 
 
-async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now_ts: int) -> None:
-    if not record.uid:
+def _apply_query_result(record: WavesStaminaRecord, data: Optional[Dict], now_ts: int) -> None:
+    """把API查询结果同步到内存中的记录，用于推算下一次检查时间"""
+    if not data:
         return
+    daily_info = data["daily_info"]
+    record.mr_query_time = now_ts
+    record.mr_value = daily_info.energyData.cur if daily_info.energyData else None
+    record.is_ck_valid = True
+
+
+def _activity_key(record: WavesStaminaRecord) -> ActivityKey:
+    return (record.user_id, record.bot_id, record.bot_self_id or "")
+
+
+def _is_active(last_active_time: Optional[int], active_days: int, now_ts: int) -> bool:
+    if last_active_time is None:
+        return False
+    return last_active_time >= now_ts - active_days * 24 * 60 * 60
+
+
+async def _handle_record(
+    record: WavesStaminaRecord,
+    threshold_default: int,
+    now_ts: int,
+    last_active_times: Optional[Dict[ActivityKey, Optional[int]]] = None,
+) -> str:
+    """处理单条记录，返回处理结果；last_active_times 为批量预取的活跃时间"""
+    if not record.uid:
+        return "no_uid"
     if record.stamina_push_switch != "on":
         logger.debug(f"[体力推送·推送] 跳过 uid={record.uid}：推送未开启")
-        return
+        return "switch_off"
     if not record.user_email:
         logger.debug(f"[体力推送·推送] 跳过 uid={record.uid}：未设置邮箱")
-        return
+        return "no_email"
     if record.email_fail_count is not None and record.email_fail_count >= 5:
         logger.debug(f"[体力推送·推送] 跳过 uid={record.uid}：连续失败次数过多 ({record.email_fail_count})")
-        return
+        return "fail_limit"
 
     active_days = RoverReminderConfig.get_config("ActiveUserDays").data
     if active_days and active_days > 0:
-        is_active = await WavesUserActivity.is_user_active(
-            record.user_id,
-            record.bot_id,
-            record.bot_self_id or "",
-            active_days,
-        )
+        activity_key = _activity_key(record)
+        if last_active_times is not None and activity_key in last_active_times:
+            is_active = _is_active(last_active_times[activity_key], active_days, now_ts)
+        else:
+            with stage_timer("activity"):
+                is_active = await WavesUserActivity.is_user_active(*activity_key, active_days)
         if not is_active:
             logger.debug(f"[体力推送·推送] 跳过 uid={record.uid}：不活跃")
-            return
+            return "inactive"
 
-    threshold = record.stamina_threshold or threshold_default
-    if threshold < 120:
-        threshold = 120
-    if threshold > 240:
-        threshold = 240
+    threshold = get_push_threshold(record, threshold_default)
 
     if not _should_try_send(record, threshold, now_ts):
-        cooldown_hours = max(1, threshold // 10 - 1)
+        cooldown_hours = get_cooldown_hours(threshold)
         last_try = record.email_last_success_time or 0
         logger.debug(
             f"[体力推送·推送] uid={record.uid} 未到发送间隔，跳过发送 last_success={last_try} cooldown_hours={cooldown_hours}"
         )
-        return
+        return "cooldown"
 
     current_stamina = _calc_current_stamina(record, now_ts)
     if current_stamina is None:
+        if waves_api.scan_blocked_for() > 0:
+            logger.debug(f"[体力推送·推送] uid={record.uid} 接口熔断中，推迟检查")
+            return "circuit_open"
         logger.debug(f"[体力推送·推送] uid={record.uid} 缺少本地体力记录，尝试查询")
         ev = Event(
             user_id=record.user_id,
@@ -133,16 +207,19 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
             bot_self_id=record.bot_self_id or "",
         )
         data = await process_uid(record.uid, ev)
+        if data == API_UNAVAILABLE:
+            return _unavailable_reason(record)
         if not data:
             logger.debug(f"[体力推送·推送] uid={record.uid} API查询失败或CK失效，未发送邮件")
-            return
+            return "api_failed"
+        _apply_query_result(record, data, now_ts)
         daily_info = data["daily_info"]
         stamina_value = daily_info.energyData.cur if daily_info.energyData else 0
         if stamina_value < threshold:
             logger.debug(
                 f"[体力推送·推送] uid={record.uid} API体力={stamina_value} 未达阈值={threshold}，不发送邮件"
             )
-            return
+            return "below_threshold"
         current_stamina = stamina_value
 
     will_check_api = current_stamina >= threshold
@@ -150,7 +227,10 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
         f"[体力推送·推送] uid={record.uid} 本地推测体力={current_stamina} 阈值={threshold} 预计请求API={will_check_api}"
     )
     if not will_check_api:
-        return
+        return "below_threshold"
+    if waves_api.scan_blocked_for() > 0:
+        logger.debug(f"[体力推送·推送] uid={record.uid} 接口熔断中，推迟检查")
+        return "circuit_open"
 
     ev = Event(
         user_id=record.user_id,
@@ -158,9 +238,12 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
         bot_self_id=record.bot_self_id or "",
     )
     data = await process_uid(record.uid, ev)
+    if data == API_UNAVAILABLE:
+        return _unavailable_reason(record)
     if not data:
         logger.debug(f"[体力推送·推送] uid={record.uid} API查询失败或CK失效，未发送邮件")
-        return
+        return "api_failed"
+    _apply_query_result(record, data, now_ts)
 
     daily_info = data["daily_info"]
     stamina_value = daily_info.energyData.cur if daily_info.energyData else 0
@@ -168,14 +251,21 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
         logger.debug(
             f"[体力推送·推送] uid={record.uid} API体力={stamina_value} 未达阈值={threshold}，不发送邮件"
         )
-        return
+        return "below_threshold"
 
     now_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        from ..mail.send import send_stamina_email
+        from ..mail.send import MAIL_SKIPPED, send_stamina_email
+        from ..mail.image_render import can_render
     except Exception as e:
         logger.warning(f"[体力推送·推送] 邮件发送模块未就绪: {e}")
-        return
+        return "mail_unavailable"
+
+    if not shard_leases.owns_uid(record.uid):
+        logger.debug(f"[体力推送·推送] uid={record.uid} 所在分片已不由本实例持有，跳过发送")
+        return "not_owner"
+
+    account_info = await _load_account_info(record.uid, data["ck"]) if can_render() else None
 
     ok = False
     msg = ""
@@ -190,30 +280,43 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
             threshold,
             now_text,
             daily_info,
-            data.get("account_info"),
+            account_info,
             record.user_id,
             record.bot_id,
             record.bot_self_id or "",
+            should_send=lambda: shard_leases.owns_uid(record.uid),
         )
     except Exception as e:
         msg = str(e)
         logger.debug(f"[体力推送·推送] 邮件发送异常 uid={record.uid} reason={msg}")
 
+    if not ok and msg == MAIL_SKIPPED:
+        logger.debug(f"[体力推送·推送] uid={record.uid} 排队期间分片已不由本实例持有，取消发送")
+        return "not_owner"
+
     new_fail_count = 0 if ok else (record.email_fail_count or 0) + 1
     success_time = now_ts if ok else None
+    email_status = {
+        "email_last_try_time": now_ts,
+        "email_send_success": ok,
+        "email_fail_count": new_fail_count,
+    }
+    if success_time is not None:
+        email_status["email_last_success_time"] = success_time
     try:
-        await WavesStaminaRecord.update_email_status(
+        await update_stamina_record(
             user_id=record.user_id,
             bot_id=record.bot_id,
             bot_self_id=record.bot_self_id or "",
             uid=record.uid,
-            email_last_try_time=now_ts,
-            email_send_success=ok,
-            email_fail_count=new_fail_count,
-            email_last_success_time=success_time,
+            # 分片租约可能随后失效，立即提交发送状态，避免接管的实例重复发送
+            flush=shard_leases.enabled,
+            **email_status,
         )
     except Exception:
         logger.exception("[体力推送·推送] 更新邮件状态失败")
+    for k, v in email_status.items():
+        setattr(record, k, v)
 
     if ok:
         record_success()
@@ -227,34 +330,211 @@ async def _handle_record(record: WavesStaminaRecord, threshold_default: int, now
         mail_logger.warning(
             f"发送失败 uid={record.uid} user_id={record.user_id} email={record.user_email} stamina={stamina_value} reason={msg}"
         )
+    return "sent" if ok else "send_failed"
+
+
+def _reschedule(record: WavesStaminaRecord, threshold_default: int, not_before: int) -> None:
+    key = record_key(record)
+    due_ts = calc_due_time(record, threshold_default, not_before)
+    if due_ts is None:
+        due_scheduler.remove(key)
+    else:
+        due_scheduler.schedule(key, due_ts)
 
 
-@scheduler.scheduled_job("interval", minutes=6, id="roverreminder_check")
+@on_record_changed
+async def refresh_record_schedule(user_id: str, bot_id: str, uid: str) -> None:
+    """配置变更后重新读取记录并更新其检查时间"""
+    key: RecordKey = (user_id, bot_id, uid)
+    try:
+        records = await WavesStaminaRecord.get_records_by_keys([key])
+    except Exception:
+        logger.exception(f"[体力推送·推送] 更新检查计划失败 uid={uid}")
+        return
+    if not records or not shard_leases.owns_uid(uid):
+        due_scheduler.remove(key)
+        return
+    threshold_default = RoverReminderConfig.get_config("StaminaPushThreshold").data
+    _reschedule(records[0], threshold_default, int(time.time()))
+
+
+async def _sync_all_records() -> None:
+    threshold_default = RoverReminderConfig.get_config("StaminaPushThreshold").data
+    now_ts = int(time.time())
+    records = await WavesStaminaRecord.get_push_candidates(
+        threshold_default,
+        now_ts,
+        cooldown_horizon=RESYNC_INTERVAL,
+    )
+    if shard_leases.enabled:
+        records = [record for record in records if shard_leases.owns_uid(record.uid)]
+    for record in records:
+        _reschedule(record, threshold_default, now_ts)
+    due_scheduler.retain(record_key(record) for record in records)
+    logger.debug(f"[体力推送·推送] 同步检查计划完成，记录数={len(records)} 待检查={len(due_scheduler)}")
+
+
+async def _run_due_records(keys: List[RecordKey]) -> None:
+    started = time.perf_counter()
+    api_calls_before = API_CALLS.total()
+    keys = [key for key in keys if shard_leases.owns_uid(key[2])]
+    if not keys:
+        return
+    threshold_default = RoverReminderConfig.get_config("StaminaPushThreshold").data
+    records = await WavesStaminaRecord.get_push_candidates(threshold_default, int(time.time()), keys=keys)
+    logger.debug(f"[体力推送·推送] 开始检查到期记录，记录数={len(records)} 默认阈值={threshold_default}")
+
+    last_active_times: Optional[Dict[ActivityKey, Optional[int]]] = None
+    active_days = RoverReminderConfig.get_config("ActiveUserDays").data
+    if records and active_days and active_days > 0:
+        try:
+            with stage_timer("activity"):
+                last_active_times = await WavesUserActivity.get_last_active_times(
+                    [_activity_key(record) for record in records]
+                )
+        except Exception:
+            logger.exception("[体力推送·推送] 批量查询活跃时间失败，改为逐条查询")
+
+    uids = [record.uid for record in records]
+    try:
+        users = await WavesUser.select_by_uids(uids, game_id=WAVES_GAME_ID)
+    except Exception:
+        logger.exception("[体力推送·推送] 批量查询账号失败，改为逐条查询")
+        uids, users = [], []
+
+    concurrency = max(1, RoverReminderConfig.get_config("PushConcurrency").data)
+    reasons: Counter = Counter()
+    # 固定数量的工作协程从队列取记录处理，避免记录较多时一次创建大量协程
+    pending: asyncio.Queue = asyncio.Queue()
+    for record in records:
+        pending.put_nowait(record)
+
+    async def _process(record: WavesStaminaRecord) -> None:
+        now_ts = int(time.time())
+        result = "error"
+        try:
+            with request_deadline(RECORD_API_DEADLINE):
+                result = await _handle_record(record, threshold_default, now_ts, last_active_times)
+        except Exception:
+            logger.exception(f"[体力推送·推送] 处理记录失败 uid={record.uid}")
+        reasons[result] += 1
+        if result == "not_owner":
+            due_scheduler.remove(record_key(record))
+            return
+        if result == "inactive":
+            interval = INACTIVE_RECHECK_INTERVAL
+        elif result == "circuit_open":
+            interval = max(1, int(waves_api.scan_blocked_for()))
+        else:
+            interval = RETRY_INTERVAL
+        _reschedule(record, threshold_default, int(time.time()) + interval)
+
+    async def _worker() -> None:
+        while True:
+            try:
+                record = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await _process(record)
+
+    async with write_behind():
+        with waves_api.prefetched_users(uids, users):
+            await asyncio.gather(*(_worker() for _ in range(min(concurrency, len(records)))))
+
+    record_scan_cycle(
+        scanned=len(records),
+        reasons=reasons,
+        api_calls=int(API_CALLS.total() - api_calls_before),
+        duration=time.perf_counter() - started,
+    )
+
+
+async def _scheduler_loop() -> None:
+    global _resync_requested
+    while True:
+        try:
+            await shard_leases.refresh()
+            async with _check_lock:
+                await _sync_all_records()
+            break
+        except Exception:
+            logger.exception("[体力推送·推送] 初始化检查计划失败")
+            await asyncio.sleep(RETRY_INTERVAL)
+
+    while True:
+        try:
+            if _resync_requested:
+                _resync_requested = False
+                async with _check_lock:
+                    await _sync_all_records()
+                continue
+            next_due = due_scheduler.next_due()
+            now_ts = int(time.time())
+            if next_due is None or next_due > now_ts:
+                timeout = MAX_IDLE_SECONDS if next_due is None else min(next_due - now_ts, MAX_IDLE_SECONDS)
+                await due_scheduler.wait(timeout)
+                continue
+            if not RoverReminderConfig.get_config("EnableStaminaPush").data:
+                await asyncio.sleep(MAX_IDLE_SECONDS)
+                continue
+
+            async with _check_lock:
+                keys = due_scheduler.pop_due(now_ts)
+                if keys:
+                    await _run_due_records(keys)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("[体力推送·推送] 到期检查失败")
+            await asyncio.sleep(RETRY_INTERVAL)
+
+
+def _ensure_scheduler_loop() -> None:
+    global _loop_task
+    if _loop_task is None or _loop_task.done():
+        _loop_task = asyncio.create_task(_scheduler_loop())
+
+
+@on_core_start
+async def _start_push_scheduler():
+    try:
+        await WavesStaminaRecord.migrate_unique_key()
+    except Exception:
+        logger.exception("[体力推送·数据库] 补建体力记录唯一索引失败")
+    _ensure_scheduler_loop()
+
+
+@scheduler.scheduled_job("interval", seconds=RESYNC_INTERVAL, id="roverreminder_check")
 async def roverreminder_check_task():
+    """定期与数据库全量同步检查计划，兜底外部对记录表的修改"""
+    if _loop_task is None or _loop_task.done():
+        _ensure_scheduler_loop()
+        return
+
     if _check_lock.locked():
-        logger.debug("[体力推送·推送] 定时检查跳过：已有任务运行中")
+        logger.debug("[体力推送·推送] 同步检查计划跳过：已有任务运行中")
         return
 
     async with _check_lock:
         if not RoverReminderConfig.get_config("EnableStaminaPush").data:
-            logger.debug("[体力推送·推送] 定时检查跳过：体力推送未开启")
+            logger.debug("[体力推送·推送] 同步检查计划跳过：体力推送未开启")
             return
         try:
-            records = await WavesStaminaRecord.get_all_records()
+            await _sync_all_records()
         except Exception:
             logger.exception("[体力推送·推送] 查询体力记录失败")
-            return
 
-        if not records:
-            logger.debug("[体力推送·推送] 定时检查结束：无体力记录")
-            return
-
-        threshold_default = RoverReminderConfig.get_config("StaminaPushThreshold").data
-        now_ts = int(time.time())
-        logger.debug(f"[体力推送·推送] 开始定时检查，记录数={len(records)} 默认阈值={threshold_default}")
 
-        for record in records:
-            try:
-                await _handle_record(record, threshold_default, now_ts)
-            except Exception:
-                logger.exception(f"[体力推送·推送] 处理记录失败 uid={record.uid}")
+@scheduler.scheduled_job("interval", seconds=LEASE_RENEW_SECONDS, id="roverreminder_shard_lease")
+async def roverreminder_shard_lease_task():
+    """续期分片租约；认领到新分片时通知调度循环同步这些分片的检查计划，不在此等待扫描"""
+    try:
+        gained = await shard_leases.refresh()
+    except Exception:
+        logger.exception("[体力推送·分片] 分片租约续期失败")
+        return
+    global _resync_requested
+    if not gained or _loop_task is None or _loop_task.done():
+        return
+    _resync_requested = True
+    due_scheduler.wake()
@@ -0,0 +1,128 @@
+import heapq
+import asyncio
+from typing import Dict, List, Tuple, Iterable, Optional
+
+from ..utils.database.models import WavesStaminaRecord
+
+# (user_id, bot_id, uid)
+RecordKey = Tuple[str, str, str]
+
+STAMINA_RECOVER_SECONDS = 360
+MIN_THRESHOLD = 120
+MAX_THRESHOLD = 240
+
+
+def record_key(record: WavesStaminaRecord) -> RecordKey:
+    return (record.user_id, record.bot_id, record.uid)
+
+
+def get_push_threshold(record: WavesStaminaRecord, threshold_default: int) -> int:
+    threshold = record.stamina_threshold or threshold_default
+    return min(max(threshold, MIN_THRESHOLD), MAX_THRESHOLD)
+
+
+def get_cooldown_hours(threshold: int) -> int:
+    return max(1, threshold // 10 - 1)
+
+
+def is_push_candidate(record: WavesStaminaRecord) -> bool:
+    if not record.uid or not record.user_email:
+        return False
+    if record.stamina_push_switch != "on":
+        return False
+    return record.email_fail_count is None or record.email_fail_count < 5
+
+
+def calc_due_time(record: WavesStaminaRecord, threshold_default: int, not_before: int) -> Optional[int]:
+    """推算记录下一次需要检查的时间，不需要推送的记录返回 None"""
+    if not is_push_candidate(record):
+        return None
+
+    threshold = get_push_threshold(record, threshold_default)
+    due = not_before
+    if record.email_last_success_time is not None:
+        due = max(due, record.email_last_success_time + get_cooldown_hours(threshold) * 3600)
+    if record.mr_query_time is not None and record.mr_value is not None:
+        missing = max(0, threshold - record.mr_value)
+        due = max(due, record.mr_query_time + missing * STAMINA_RECOVER_SECONDS)
+    return due
+
+
+class DueScheduler:
+    """按预计到期时间排序的待检查记录堆，过期条目采用惰性删除"""
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[int, RecordKey]] = []
+        self._due: Dict[RecordKey, int] = {}
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: RecordKey) -> bool:
+        return key in self._due
+
+    def schedule(self, key: RecordKey, due_ts: int) -> None:
+        if self._due.get(key) == due_ts:
+            return
+        self._due[key] = due_ts
+        heapq.heappush(self._heap, (due_ts, key))
+        if self._heap[0] == (due_ts, key):
+            self._wakeup.set()
+        self._maybe_compact()
+
+    def remove(self, key: RecordKey) -> None:
+        self._due.pop(key, None)
+
+    def retain(self, keys: Iterable[RecordKey]) -> None:
+        keep = set(keys)
+        for key in [k for k in self._due if k not in keep]:
+            del self._due[key]
+        self._maybe_compact()
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._due.clear()
+
+    def _is_stale(self, entry: Tuple[int, RecordKey]) -> bool:
+        due_ts, key = entry
+        return self._due.get(key) != due_ts
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due_ts, key) for key, due_ts in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[int]:
+        while self._heap and self._is_stale(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_ts: int, limit: Optional[int] = None) -> List[RecordKey]:
+        keys: List[RecordKey] = []
+        while self._heap and (limit is None or len(keys) < limit):
+            entry = self._heap[0]
+            if self._is_stale(entry):
+                heapq.heappop(self._heap)
+                continue
+            if entry[0] > now_ts:
+                break
+            heapq.heappop(self._heap)
+            del self._due[entry[1]]
+            keys.append(entry[1])
+        return keys
+
+    def wake(self) -> None:
+        """唤醒正在等待的调度循环"""
+        self._wakeup.set()
+
+    async def wait(self, timeout: float) -> None:
+        """等待到超时，或在有更早到期的记录加入时提前唤醒"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+
+due_scheduler = DueScheduler()
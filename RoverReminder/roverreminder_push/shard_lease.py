@@ -0,0 +1,128 @@
+import os
+import math
+import time
+import zlib
+import socket
+import secrets
+from typing import Set, Dict, List
+
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
+
+from ..utils.database.scan_lease import WavesScanLease
+from ..roverreminder_config.roverreminder_config import RoverReminderConfig
+
+SHARD_PREFIX = "shard:"
+NODE_PREFIX = "node:"
+# 租约有效期与续期间隔，续期失败时提前 LEASE_SAFETY 秒停止处理，避免与接管的实例重复发送
+LEASE_TTL = 90
+LEASE_RENEW_SECONDS = 30
+LEASE_SAFETY = 15
+
+
+def shard_of(uid: str, shard_count: int) -> int:
+    return zlib.crc32(uid.encode("utf-8")) % shard_count
+
+
+def _shard_name(shard: int) -> str:
+    return f"{SHARD_PREFIX}{shard}"
+
+
+class ShardLeaseManager:
+    """按 uid 哈希把体力记录分成若干分片，多个实例通过数据库租约各自认领一部分
+
+    ScanShardCount 为 0 时不分片，本实例处理全部记录。
+    """
+
+    def __init__(self) -> None:
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(3)}"
+        self.shard_count = 0
+        # 分片 -> 租约到期时间
+        self._owned: Dict[int, int] = {}
+        self._rows_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.shard_count > 0
+
+    def owned_shards(self) -> List[int]:
+        return sorted(self._owned)
+
+    def owns_uid(self, uid: str) -> bool:
+        if not self.enabled:
+            return True
+        expires_at = self._owned.get(shard_of(uid, self.shard_count))
+        return expires_at is not None and expires_at - LEASE_SAFETY > time.time()
+
+    async def refresh(self) -> bool:
+        """续期并按存活实例数均衡认领分片，返回是否新增了分片"""
+        shard_count = max(0, RoverReminderConfig.get_config("ScanShardCount").data)
+        if shard_count != self.shard_count:
+            await self.release_all()
+            self.shard_count = shard_count
+            self._rows_ready = False
+        if not self.enabled:
+            return False
+
+        now = int(time.time())
+        expires_at = now + LEASE_TTL
+        if not self._rows_ready:
+            await WavesScanLease.ensure_rows([_shard_name(i) for i in range(shard_count)])
+            self._rows_ready = True
+        await WavesScanLease.heartbeat(f"{NODE_PREFIX}{self.node_id}", self.node_id, expires_at)
+
+        renewed = await WavesScanLease.renew([_shard_name(s) for s in self._owned], self.node_id, expires_at)
+        owned: Set[int] = {int(name[len(SHARD_PREFIX) :]) for name in renewed}
+        previous = set(self._owned)
+
+        leases = await WavesScanLease.get_all()
+        nodes = {lease.owner for lease in leases if lease.name.startswith(NODE_PREFIX) and lease.expires_at >= now}
+        nodes.add(self.node_id)
+        target = math.ceil(shard_count / len(nodes))
+
+        if len(owned) > target:
+            # 有新实例加入时让出多余的分片，由其在下次续期时认领
+            extra = sorted(owned)[target:]
+            await WavesScanLease.release([_shard_name(s) for s in extra], self.node_id)
+            owned.difference_update(extra)
+        elif len(owned) < target:
+            free = sorted(
+                int(lease.name[len(SHARD_PREFIX) :])
+                for lease in leases
+                if lease.name.startswith(SHARD_PREFIX) and lease.expires_at < now
+            )
+            for shard in free:
+                if len(owned) >= target:
+                    break
+                if shard < shard_count and await WavesScanLease.try_acquire(
+                    _shard_name(shard), self.node_id, expires_at, now
+                ):
+                    owned.add(shard)
+
+        self._owned = {shard: expires_at for shard in owned}
+        await WavesScanLease.delete_expired(NODE_PREFIX, now - LEASE_TTL)
+
+        gained = owned - previous
+        if gained or previous - owned:
+            logger.info(
+                f"[体力推送·分片] 实例 {self.node_id} 持有分片 {self.owned_shards()}/{shard_count} 存活实例={len(nodes)}"
+            )
+        return bool(gained)
+
+    async def release_all(self) -> None:
+        if not self._owned:
+            return
+        names = [_shard_name(s) for s in self._owned]
+        self._owned = {}
+        await WavesScanLease.release(names, self.node_id)
+
+
+shard_leases = ShardLeaseManager()
+
+
+@on_core_shutdown
+async def _release_shard_leases():
+    try:
+        await shard_leases.release_all()
+    except Exception:
+        logger.exception("[体力推送·分片] 释放分片租约失败")
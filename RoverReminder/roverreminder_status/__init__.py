@@ -1,7 +1,11 @@
 from gsuid_core.status.plugin_status import register_status
 
 from ..utils.image import get_ICON
+from ..utils.api.telemetry import api_error_telemetry
+from ..utils.metrics import get_last_cycle, get_stage_summary
+from ..roverreminder_push.shard_lease import shard_leases
 from ..utils.status_store import get_today_counts, get_yesterday_counts
+from . import metrics_export as _  # noqa: F401
 
 
 async def get_today_success():
@@ -17,6 +21,39 @@ async def get_yesterday_total():
     return data.get("success", 0) + data.get("fail", 0)
 
 
+async def get_api_error_total():
+    return api_error_telemetry.get_total()
+
+
+async def get_last_cycle_scanned():
+    cycle = get_last_cycle()
+    return cycle["scanned"] if cycle else 0
+
+
+async def get_last_cycle_seconds():
+    cycle = get_last_cycle()
+    return round(cycle["duration"], 2) if cycle else 0
+
+
+async def get_last_cycle_api_calls():
+    cycle = get_last_cycle()
+    return cycle["api_calls"] if cycle else 0
+
+
+async def get_smtp_avg_ms():
+    return round(get_stage_summary("smtp")["avg"] * 1000)
+
+
+async def get_fetch_avg_ms():
+    return round(get_stage_summary("daily_fetch")["avg"] * 1000)
+
+
+async def get_owned_shards():
+    if not shard_leases.enabled:
+        return "未分片"
+    return f"{len(shard_leases.owned_shards())}/{shard_leases.shard_count}"
+
+
 register_status(
     get_ICON(),
     "RoverReminder",
@@ -24,5 +61,12 @@ register_status(
         "今日发送成功": get_today_success,
         "今日发送失败": get_today_fail,
         "昨日发送": get_yesterday_total,
+        "接口异常次数": get_api_error_total,
+        "上轮检查记录": get_last_cycle_scanned,
+        "上轮检查耗时(秒)": get_last_cycle_seconds,
+        "上轮接口调用": get_last_cycle_api_calls,
+        "体力查询平均(ms)": get_fetch_avg_ms,
+        "邮件发送平均(ms)": get_smtp_avg_ms,
+        "持有扫描分片": get_owned_shards,
     },
 )
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Optional
+
+from gsuid_core.aps import scheduler
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_start, on_core_shutdown
+
+from ..utils.util import atomic_write_text
+from ..utils.resource.RESOURCE_PATH import METRICS_PATH
+from ..utils.metrics import MAIL_QUEUE_DEPTH, render_prometheus, render_openmetrics
+from ..roverreminder_config.roverreminder_config import RoverReminderConfig
+
+METRICS_FLUSH_SECONDS = 60
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_server: Optional[asyncio.AbstractServer] = None
+
+
+def _collect(openmetrics: bool = True) -> str:
+    """刷新采集时计算的指标后输出文本，文件使用 Prometheus 文本格式，接口使用 OpenMetrics 格式"""
+    try:
+        from ..mail.send import get_mail_queue_stats
+
+        MAIL_QUEUE_DEPTH.set(get_mail_queue_stats()["queue_depth"])
+    except Exception:
+        pass
+    return render_openmetrics() if openmetrics else render_prometheus()
+
+
+def _write_textfile(text: str) -> None:
+    atomic_write_text(METRICS_PATH, text)
+
+
+@scheduler.scheduled_job("interval", seconds=METRICS_FLUSH_SECONDS, id="roverreminder_metrics_textfile")
+async def _write_metrics_task():
+    if not RoverReminderConfig.get_config("MetricsTextfile").data:
+        return
+    try:
+        await asyncio.to_thread(_write_textfile, _collect(openmetrics=False))
+    except Exception:
+        logger.exception("[体力推送·指标] 指标文件写入失败")
+
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == "/metrics":
+            status, content_type, body = "200 OK", CONTENT_TYPE, _collect().encode("utf-8")
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug(f"[体力推送·指标] 指标请求处理失败: {e}")
+    finally:
+        writer.close()
+
+
+@on_core_start
+async def _start_metrics_server():
+    global _server
+    port = RoverReminderConfig.get_config("MetricsHttpPort").data
+    if not port or port <= 0 or _server is not None:
+        return
+    try:
+        _server = await asyncio.start_server(_handle_metrics_request, "127.0.0.1", port)
+        logger.info(f"[体力推送·指标] 指标接口已启动 http://127.0.0.1:{port}/metrics")
+    except OSError as e:
+        logger.warning(f"[体力推送·指标] 指标接口启动失败: {e}")
+
+
+@on_core_shutdown
+async def _stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
+    if RoverReminderConfig.get_config("MetricsTextfile").data:
+        try:
+            _write_textfile(_collect(openmetrics=False))
+        except Exception:
+            logger.exception("[体力推送·指标] 指标文件写入失败")
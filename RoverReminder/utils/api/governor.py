@@ -0,0 +1,162 @@
+import time
+from typing import Dict, Iterable, Optional
+
+from gsuid_core.logger import logger
+
+from ..rate_limit import TokenBucket
+from ..metrics import API_RATE_LIMIT, API_BREAKER_TRIPS
+from .request_util import RespCode, ThrowMsg, KuroApiResp
+
+# 连续异常达到该次数后熔断
+FAILURE_THRESHOLD = 5
+# 多次熔断时熔断时间翻倍的上限
+MAX_OPEN_SECONDS = 600
+# 半开状态下探测请求的超时时间，超时后允许新的探测
+PROBE_TIMEOUT = 30
+# AIMD：正常响应时每次增加的速率，异常时速率减半且不低于 MIN_RATE
+RATE_INCREASE_STEP = 0.1
+MIN_RATE = 0.5
+DECREASE_INTERVAL = 1.0
+
+
+def endpoint_name(url: str) -> str:
+    return url.rsplit("/", 1)[-1]
+
+
+def is_throttle_response(status_code: Optional[int], resp: Optional[KuroApiResp]) -> bool:
+    """风控、服务端错误、系统繁忙及网络异常视为需要退避的响应"""
+    if resp is None:
+        return True
+    if status_code is not None and status_code >= 500:
+        return True
+    if resp.code in (RespCode.DANGER_ENV, RespCode.SERVER_ERROR, RespCode.ERROR):
+        return True
+    return resp.msg == ThrowMsg.SYSTEM_BUSY
+
+
+class CircuitBreaker:
+    """连续异常达到阈值后熔断一段时间，到期后放行一个探测请求"""
+
+    def __init__(self, name: str, open_seconds: float, failure_threshold: int = FAILURE_THRESHOLD) -> None:
+        self.name = name
+        self.open_seconds = open_seconds
+        self.failure_threshold = failure_threshold
+        self._failures = 0
+        self._trips = 0
+        self._opened_until = 0.0
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if not self._opened_until:
+            return "closed"
+        if time.monotonic() < self._opened_until:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic())
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        now = time.monotonic()
+        if self._probe_started is not None and now - self._probe_started < PROBE_TIMEOUT:
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_until:
+            logger.info(f"[体力推送·请求] 接口 {self.name} 已恢复")
+        self._failures = 0
+        self._trips = 0
+        self._opened_until = 0.0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probe_started is not None or self._failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self) -> None:
+        self._trips += 1
+        duration = min(MAX_OPEN_SECONDS, self.open_seconds * 2 ** (self._trips - 1))
+        self._opened_until = time.monotonic() + duration
+        self._failures = 0
+        self._probe_started = None
+        API_BREAKER_TRIPS.inc(endpoint=self.name)
+        logger.warning(f"[体力推送·请求] 接口 {self.name} 连续异常，熔断 {duration:.0f} 秒")
+
+
+class ApiGovernor:
+    """按接口熔断，并以全局令牌桶限制请求速率，异常时速率减半、正常时逐步恢复"""
+
+    def __init__(self) -> None:
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._bucket = TokenBucket(0)
+        self._max_rate = 0.0
+        self._open_seconds = 60.0
+        self._last_decrease = 0.0
+
+    def _sync_config(self) -> None:
+        from ...roverreminder_config.roverreminder_config import RoverReminderConfig
+
+        max_rate = float(max(0, RoverReminderConfig.get_config("ApiMaxRps").data))
+        if max_rate != self._max_rate:
+            self._max_rate = max_rate
+            self._set_rate(max_rate)
+        open_seconds = float(max(1, RoverReminderConfig.get_config("ApiBreakerSeconds").data))
+        if open_seconds != self._open_seconds:
+            self._open_seconds = open_seconds
+            for breaker in self._breakers.values():
+                breaker.open_seconds = open_seconds
+
+    def _set_rate(self, rate: float) -> None:
+        self._bucket.set_rate(rate, capacity=max(1.0, rate))
+        API_RATE_LIMIT.set(rate)
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, self._open_seconds)
+        return breaker
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def blocked_for(self, endpoints: Iterable[str]) -> float:
+        """返回给定接口中处于熔断状态的最长剩余时间，未熔断时为 0"""
+        blocked = 0.0
+        for endpoint in endpoints:
+            breaker = self._breakers.get(endpoint)
+            if breaker is not None and breaker.state == "open":
+                blocked = max(blocked, breaker.retry_after())
+        return blocked
+
+    async def acquire(self, endpoint: str) -> bool:
+        """熔断中返回 False，否则按当前速率等待令牌后返回 True"""
+        self._sync_config()
+        if not self._breaker(endpoint).allow():
+            return False
+        await self._bucket.acquire()
+        return True
+
+    def record(self, endpoint: str, throttled: bool) -> None:
+        breaker = self._breaker(endpoint)
+        if not throttled:
+            breaker.record_success()
+            if self._max_rate > 0 and self.rate < self._max_rate:
+                self._set_rate(min(self._max_rate, self.rate + RATE_INCREASE_STEP))
+            return
+
+        breaker.record_failure()
+        now = time.monotonic()
+        if self._max_rate > 0 and now - self._last_decrease >= DECREASE_INTERVAL:
+            self._last_decrease = now
+            self._set_rate(max(MIN_RATE, self.rate / 2))
+            logger.debug(f"[体力推送·请求] 接口 {endpoint} 响应异常，请求速率降至 {self.rate:.2f}/s")
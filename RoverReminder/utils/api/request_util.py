@@ -1,12 +1,16 @@
+import time
 import random
+import asyncio
 from enum import IntEnum
-from typing import Any, Dict, Generic, Optional, TypeVar
+from types import MappingProxyType
+from typing import Any, Dict, Generic, Mapping, Optional, TypeVar
 
 from pydantic import BaseModel, ConfigDict, Field, computed_field, model_validator
 
 from gsuid_core.logger import logger
 
-from ..util import generate_random_string, get_public_ip
+from ..util import DEFAULT_PUBLIC_IP, generate_random_string, get_public_ip
+from .telemetry import api_error_telemetry
 
 KURO_VERSION = "3.0.3"
 CONTENT_TYPE = "application/x-www-form-urlencoded; charset=utf-8"
@@ -19,25 +23,94 @@ ANDROID_USER_AGENT = (
     "AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/143.0.7499.34 "
     "Mobile Safari/537.36 Kuro/3.0.0 KuroGameBox/3.0.0"
 )
+PLATFORM_USER_AGENTS = {
+    "ios": IOS_USER_AGENT,
+    "android": ANDROID_USER_AGENT,
+}
+
+# 公网IP缓存时间，查询失败时使用较短的重试间隔
+PUBLIC_IP_TTL = 30 * 60
+PUBLIC_IP_RETRY_TTL = 60
+
+
+class BaseHeaderProvider:
+    """缓存公网IP并预构建各平台的基础请求头，构建请求头时不再发起网络请求"""
+
+    def __init__(self, ttl: int = PUBLIC_IP_TTL, retry_ttl: int = PUBLIC_IP_RETRY_TTL) -> None:
+        self._ttl = ttl
+        self._retry_ttl = retry_ttl
+        self._ip: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._base_templates: Dict[str, Mapping[str, str]] = {
+            platform: MappingProxyType(
+                {
+                    "source": platform,
+                    "Content-Type": CONTENT_TYPE,
+                    "User-Agent": user_agent,
+                    "version": KURO_VERSION,
+                }
+            )
+            for platform, user_agent in PLATFORM_USER_AGENTS.items()
+        }
+        self._templates: Dict[str, Mapping[str, str]] = {}
+
+    @property
+    def public_ip(self) -> Optional[str]:
+        return self._ip
+
+    def _apply_ip(self, ip: str) -> None:
+        self._ip = ip
+        ttl = self._retry_ttl if ip == DEFAULT_PUBLIC_IP else self._ttl
+        self._expires_at = time.monotonic() + ttl
+        self._templates = {
+            platform: MappingProxyType({**base, "devCode": f"{ip}, {base['User-Agent']}"})
+            for platform, base in self._base_templates.items()
+        }
+
+    async def refresh(self) -> None:
+        ip = await get_public_ip()
+        if ip != self._ip:
+            logger.debug(f"[体力推送·请求] 公网IP已更新: {ip}")
+        self._apply_ip(ip)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("[体力推送·请求] 后台刷新公网IP失败")
+
+    async def get_template(self, platform: str = "ios") -> Mapping[str, str]:
+        if not self._templates:
+            async with self._lock:
+                if not self._templates:
+                    await self.refresh()
+        elif time.monotonic() >= self._expires_at:
+            # 过期后先返回旧模板，后台异步刷新
+            self._schedule_refresh()
+        return self._templates[platform]
+
+    def get_base_template(self, platform: str = "ios") -> Mapping[str, str]:
+        return self._base_templates[platform]
+
+
+header_provider = BaseHeaderProvider()
 
 
 async def get_base_header(devCode: Optional[str] = None) -> Dict[str, str]:
     # platform_source = random.choice(["ios", "android"])
-    # user_agent = IOS_USER_AGENT if platform_source == "ios" else ANDROID_USER_AGENT
     platform_source = "ios"
-    user_agent = IOS_USER_AGENT
-    header = {
-        "source": platform_source,
-        "Content-Type": CONTENT_TYPE,
-        "User-Agent": user_agent,
-        "version": KURO_VERSION,
-    }
     if devCode:
+        header = dict(header_provider.get_base_template(platform_source))
         header["devCode"] = devCode
-    else:
-        ip = await get_public_ip()
-        header["devCode"] = f"{ip}, {user_agent}"
-    return header
+        return header
+    return dict(await header_provider.get_template(platform_source))
 
 
 async def get_community_header() -> Dict[str, str]:
@@ -89,10 +162,7 @@ def check_send_master_info(code: int, msg: str, data: Optional[T] = None) -> boo
     if code in NOT_SEND_MASTER_INFO_CODES:
         return False
 
-    import inspect
-
-    callers = [f.function for f in inspect.stack()[5:8][::-1]]
-    logger.warning(f"[体力推送·UID工具] {'.'.join(callers)} code: {code} msg: {msg} data: {data}")
+    api_error_telemetry.record(code, msg, data)
     return isinstance(msg, str) and msg != ""
 
 
@@ -131,7 +201,12 @@ class KuroApiResp(BaseModel, Generic[T]):
     def is_bat_token_invalid(self) -> bool:
         if self.code == RespCode.BAT_TOKEN_INVALID.value:
             return True
-        return self.msg in ("数据令牌已失效")
+        return self.msg in ("数据令牌已失效",)
+
+    @property
+    def is_unavailable(self) -> bool:
+        """网络异常、熔断或超时等未得到有效响应的情况，不能据此判断登录状态"""
+        return self.code == RespCode.ERROR.value
 
     @model_validator(mode="after")
     def _post_validate(self) -> "KuroApiResp[T]":
@@ -1,20 +1,166 @@
-import asyncio
+import time
 import json
-from typing import Any, Dict, Optional, Union
+import asyncio
+import hashlib
+import inspect
+import contextvars
+from functools import wraps
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple, Union, Callable, Iterable, Iterator, Optional, Awaitable
 
 import httpx
 
 from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
 
 from ..constants import WAVES_GAME_ID
 from ..database.models import WavesUser
-from .api import BASE_DATA_URL, GAME_DATA_URL, LOGIN_LOG_URL, REFRESH_URL, REQUEST_TOKEN, SERVER_ID, SERVER_ID_NET
-from .request_util import KuroApiResp, get_base_header
+from ..metrics import API_CALLS, API_RETRIES, API_COALESCED
+from ..database.write_buffer import update_last_used_time
+from .api import (
+    MAIN_URL,
+    SERVER_ID,
+    REFRESH_URL,
+    BASE_DATA_URL,
+    GAME_DATA_URL,
+    LOGIN_LOG_URL,
+    REQUEST_TOKEN,
+    SERVER_ID_NET,
+)
+from .model import AccountBaseInfo
+from .governor import ApiGovernor, endpoint_name, is_throttle_response
+from .retry import RetryPolicy, get_deadline, run_with_deadline, get_remaining_time, DEFAULT_RETRY_POLICY
+from .request_util import ThrowMsg, KuroApiResp, get_base_header
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+KEEPALIVE_EXPIRY = 30
+
+# 检查周期内预取的账号记录 uid -> WavesUser 列表，只对扫描任务及其发起的共享请求可见
+_prefetched_users: ContextVar[Optional[Dict[str, List[WavesUser]]]] = ContextVar(
+    "roverreminder_prefetched_users", default=None
+)
+
+
+def single_flight(name: str):
+    """相同参数的并发调用共享同一个进行中的请求"""
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(self: "WavesApi", *args: Any, **kwargs: Any) -> Any:
+            # 按绑定后的参数生成键，位置参数、关键字参数及默认值的不同写法视为同一调用
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(bound.arguments.items())[1:])
+            return await self._single_flight(name, key, lambda: func(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
 
 
 class WavesApi:
     ssl_verify = True
 
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+        # (uid, cookie哈希) -> 校验结果过期时间
+        self._validated_ck: Dict[Tuple[str, str], float] = {}
+        # uid -> (过期时间, 账号基础信息)
+        self._base_info_cache: Dict[str, Tuple[float, AccountBaseInfo]] = {}
+        self.governor = ApiGovernor()
+        # 进行中的请求，(名称, 参数) -> Task
+        self._inflight: Dict[Tuple[Any, ...], asyncio.Task] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        from ...roverreminder_config.roverreminder_config import RoverReminderConfig
+
+        max_connections = RoverReminderConfig.get_config("ApiMaxConnections").data
+        max_keepalive = RoverReminderConfig.get_config("ApiMaxKeepalive").data
+        connect_timeout = RoverReminderConfig.get_config("ApiConnectTimeout").data
+        read_timeout = RoverReminderConfig.get_config("ApiReadTimeout").data
+        http2 = bool(RoverReminderConfig.get_config("ApiHttp2").data)
+        if http2 and not _HTTP2_AVAILABLE:
+            logger.warning("[体力推送·请求] 未安装h2依赖，HTTP/2已回退为HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            verify=self.ssl_verify,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max(1, max_connections),
+                max_keepalive_connections=max(0, min(max_keepalive, max_connections)),
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    async def _single_flight(
+        self,
+        name: str,
+        key: Tuple[Any, ...],
+        factory: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            API_COALESCED.inc(endpoint=name)
+        else:
+            # 共享的请求在空上下文中运行，发起者的写缓冲等上下文变量不会带给其他调用方，截止时间与预取记录显式传入
+            coro = self._run_shared(factory, get_deadline(), _prefetched_users.get())
+            task = contextvars.Context().run(asyncio.get_running_loop().create_task, coro)
+            self._inflight[key] = task
+
+            def _done(_: asyncio.Task) -> None:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+            task.add_done_callback(_done)
+        # 某个调用方被取消时不影响其他等待同一请求的调用方
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _run_shared(
+        factory: Callable[[], Awaitable[Any]],
+        deadline: Optional[float],
+        prefetched: Optional[Dict[str, List[WavesUser]]],
+    ) -> Any:
+        if prefetched is not None:
+            _prefetched_users.set(prefetched)
+        return await run_with_deadline(factory, deadline)
+
+    def scan_blocked_for(self) -> float:
+        """体力检查用到的接口处于熔断中时返回剩余秒数"""
+        return self.governor.blocked_for(
+            endpoint_name(url) for url in (LOGIN_LOG_URL, REFRESH_URL, REQUEST_TOKEN, GAME_DATA_URL)
+        )
+
+    def _resolve_url(self, url: str) -> str:
+        """配置了 KuroApiBaseUrl 时将官方地址替换为该地址"""
+        from ...roverreminder_config.roverreminder_config import RoverReminderConfig
+
+        base_url = RoverReminderConfig.get_config("KuroApiBaseUrl").data
+        if base_url and url.startswith(MAIN_URL):
+            return f"{base_url.rstrip('/')}{url[len(MAIN_URL):]}"
+        return url
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
     def is_net(self, role_id: str) -> bool:
         try:
             return int(role_id) >= 200000000
@@ -26,6 +172,74 @@ class WavesApi:
             return server_id
         return SERVER_ID_NET if self.is_net(role_id) else SERVER_ID
 
+    @staticmethod
+    def _cookie_hash(cookie: str) -> str:
+        return hashlib.sha256(cookie.encode("utf-8")).hexdigest()
+
+    def _is_ck_validated(self, uid: str, cookie: str) -> bool:
+        key = (uid, self._cookie_hash(cookie))
+        expires_at = self._validated_ck.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            self._validated_ck.pop(key, None)
+            return False
+        return True
+
+    def _remember_validated_ck(self, uid: str, cookie: str) -> None:
+        from ...roverreminder_config.roverreminder_config import RoverReminderConfig
+
+        ttl_minutes = RoverReminderConfig.get_config("CookieCacheMinutes").data
+        if not ttl_minutes or ttl_minutes <= 0:
+            return
+        now = time.monotonic()
+        if len(self._validated_ck) >= 1024:
+            self._validated_ck = {k: v for k, v in self._validated_ck.items() if v > now}
+        self._validated_ck[(uid, self._cookie_hash(cookie))] = now + ttl_minutes * 60
+
+    def invalidate_cookie(self, cookie: str) -> None:
+        """移除该cookie的校验缓存，下次使用时重新校验"""
+        cookie_hash = self._cookie_hash(cookie)
+        for key in [k for k in self._validated_ck if k[1] == cookie_hash]:
+            del self._validated_ck[key]
+
+    @contextmanager
+    def prefetched_users(self, uids: Iterable[str], users: Iterable[WavesUser]) -> Iterator[None]:
+        """在当前上下文（及其创建的子任务）内优先使用预取的账号记录，uids 中没有记录的 uid 视为不存在账号"""
+        prefetched: Dict[str, List[WavesUser]] = {uid: [] for uid in uids}
+        for user in users:
+            prefetched.setdefault(user.uid, []).append(user)
+        token = _prefetched_users.set(prefetched)
+        try:
+            yield
+        finally:
+            _prefetched_users.reset(token)
+
+    @staticmethod
+    def _get_prefetched(uid: str) -> Optional[List[WavesUser]]:
+        prefetched = _prefetched_users.get()
+        return None if prefetched is None else prefetched.get(uid)
+
+    def _forget_prefetched_user(self, uid: str) -> None:
+        prefetched = _prefetched_users.get()
+        if prefetched is not None:
+            prefetched.pop(uid, None)
+
+    def _find_prefetched_user(self, uid: str, user_id: str, bot_id: str) -> Tuple[bool, Optional[WavesUser]]:
+        users = self._get_prefetched(uid)
+        if users is None:
+            return False, None
+        for user in users:
+            if user.user_id == user_id and user.bot_id == bot_id and user.game_id == WAVES_GAME_ID:
+                return True, user
+        return True, None
+
+    def _find_prefetched_by_cookie(self, cookie: str, uid: str, game_id: Optional[int]) -> Optional[WavesUser]:
+        for user in self._get_prefetched(uid) or []:
+            if user.cookie == cookie and (game_id is None or user.game_id == game_id):
+                return user
+        return None
+
     async def refresh_bat_token(self, waves_user: WavesUser) -> Optional[WavesUser]:
         success, access_token = await self.get_request_token(
             waves_user.uid,
@@ -36,6 +250,9 @@ class WavesApi:
             return None
 
         waves_user.bat = access_token
+        for user in self._get_prefetched(waves_user.uid) or []:
+            if user.cookie == waves_user.cookie:
+                user.bat = access_token
         await WavesUser.update_data_by_data(
             select_data={
                 "uid": waves_user.uid,
@@ -55,11 +272,15 @@ class WavesApi:
         headers: Dict[str, Any] = {"did": "", "b-at": ""}
         if need_token:
             headers["token"] = cookie
-        waves_user = await WavesUser.select_data_by_cookie_and_uid(
-            cookie=cookie,
-            uid=uid,
-            game_id=game_id,
-        ) or await WavesUser.select_data_by_cookie(cookie=cookie)
+        waves_user = (
+            self._find_prefetched_by_cookie(cookie, uid, game_id)
+            or await WavesUser.select_data_by_cookie_and_uid(
+                cookie=cookie,
+                uid=uid,
+                game_id=game_id,
+            )
+            or await WavesUser.select_data_by_cookie(cookie=cookie)
+        )
 
         if not waves_user:
             return headers
@@ -69,32 +290,56 @@ class WavesApi:
         return headers
 
     async def get_self_waves_ck(self, uid: str, user_id: str, bot_id: str) -> Optional[str]:
-        waves_user = await WavesUser.select_waves_user(uid, user_id, bot_id, game_id=WAVES_GAME_ID)
+        """返回可用的 cookie；登录状态无效时返回空字符串，接口不可用（熔断、网络异常）时返回 None"""
+        ck, validated = await self._validate_self_ck(uid, user_id, bot_id)
+        if validated:
+            # 在调用方上下文中写入，处于 write_behind 时进入其缓冲区；共享的校验请求运行在空上下文中
+            await update_last_used_time(uid, user_id, bot_id, game_id=WAVES_GAME_ID)
+        return ck
+
+    @single_flight("self_ck")
+    async def _validate_self_ck(self, uid: str, user_id: str, bot_id: str) -> Tuple[Optional[str], bool]:
+        """返回 (cookie, 本次是否通过接口校验)"""
+        found, waves_user = self._find_prefetched_user(uid, user_id, bot_id)
+        if not found:
+            waves_user = await WavesUser.select_waves_user(uid, user_id, bot_id, game_id=WAVES_GAME_ID)
         if not waves_user or not waves_user.cookie:
-            return ""
+            return "", False
 
         if waves_user.status == "无效":
-            return ""
+            return "", False
+
+        if self._is_ck_validated(uid, waves_user.cookie):
+            return waves_user.cookie, False
 
         data = await self.login_log(uid, waves_user.cookie)
+        if data.is_unavailable:
+            return None, False
         if not data.success:
             await data.mark_cookie_invalid(uid, waves_user.cookie)
-            return ""
+            self._forget_prefetched_user(uid)
+            return "", False
 
         data = await self.refresh_data(uid, waves_user.cookie)
+        if data.is_unavailable:
+            return None, False
         if not data.success:
             if data.is_bat_token_invalid:
                 waves_user = await self.refresh_bat_token(waves_user)
                 if waves_user:
-                    await WavesUser.update_last_used_time(uid, user_id, bot_id, game_id=WAVES_GAME_ID)
-                    return waves_user.cookie
+                    self._remember_validated_ck(uid, waves_user.cookie)
+                    return waves_user.cookie, True
+                if self.scan_blocked_for() > 0:
+                    return None, False
             else:
                 await data.mark_cookie_invalid(uid, waves_user.cookie)
-            return ""
+                self._forget_prefetched_user(uid)
+            return "", False
 
-        await WavesUser.update_last_used_time(uid, user_id, bot_id, game_id=WAVES_GAME_ID)
-        return waves_user.cookie
+        self._remember_validated_ck(uid, waves_user.cookie)
+        return waves_user.cookie, True
 
+    @single_flight("request_token")
     async def get_request_token(
         self,
         role_id: str,
@@ -115,6 +360,7 @@ class WavesApi:
                 return True, access_token
         return False, ""
 
+    @single_flight("daily_info")
     async def get_daily_info(self, role_id: str, token: str):
         header = await get_base_header()
         used_headers = await self.get_used_headers(
@@ -131,8 +377,9 @@ class WavesApi:
             "serverId": self.get_server_id(role_id),
             "roleId": role_id,
         }
-        return await self._waves_request(GAME_DATA_URL, "POST", header, data=data)
+        return await self._waves_request(GAME_DATA_URL, "POST", header, data=data, cookie=token)
 
+    @single_flight("base_info")
     async def get_base_info(self, role_id: str, token: str, server_id: Optional[str] = None):
         header = await get_base_header()
         used_headers = await self.get_used_headers(cookie=token, uid=role_id, game_id=WAVES_GAME_ID)
@@ -142,8 +389,33 @@ class WavesApi:
             "serverId": self.get_server_id(role_id, server_id),
             "roleId": role_id,
         }
-        return await self._waves_request(BASE_DATA_URL, "POST", header, data=data)
+        return await self._waves_request(BASE_DATA_URL, "POST", header, data=data, cookie=token)
+
+    async def get_account_base_info(self, role_id: str, token: str) -> Optional[AccountBaseInfo]:
+        """账号基础信息变化很少，按 uid 缓存，过期或未缓存时才请求接口"""
+        from ...roverreminder_config.roverreminder_config import RoverReminderConfig
 
+        now = time.time()
+        cached = self._base_info_cache.get(role_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        resp = await self.get_base_info(role_id, token)
+        if not resp.success:
+            # 请求失败时沿用过期的缓存
+            return cached[1] if cached is not None else None
+        try:
+            account_info = AccountBaseInfo.model_validate(resp.data)
+        except Exception:
+            logger.warning(f"[体力推送·请求] 账号基础信息解析失败 uid={role_id}")
+            return None
+
+        ttl_hours = RoverReminderConfig.get_config("BaseInfoCacheHours").data
+        if ttl_hours and ttl_hours > 0:
+            self._base_info_cache[role_id] = (now + ttl_hours * 3600, account_info)
+        return account_info
+
+    @single_flight("refresh_data")
     async def refresh_data(self, role_id: str, token: str, server_id: Optional[str] = None):
         header = await get_base_header()
         used_headers = await self.get_used_headers(cookie=token, uid=role_id, game_id=WAVES_GAME_ID)
@@ -153,8 +425,9 @@ class WavesApi:
             "serverId": self.get_server_id(role_id, server_id),
             "roleId": role_id,
         }
-        return await self._waves_request(REFRESH_URL, "POST", header, data=data)
+        return await self._waves_request(REFRESH_URL, "POST", header, data=data, cookie=token)
 
+    @single_flight("login_log")
     async def login_log(self, role_id: str, token: str):
         header = await get_base_header()
         used_headers = await self.get_used_headers(cookie=token, uid=role_id, game_id=WAVES_GAME_ID)
@@ -164,7 +437,33 @@ class WavesApi:
                 "devCode": used_headers.get("did", ""),
             }
         )
-        return await self._waves_request(LOGIN_LOG_URL, "POST", header, data={})
+        return await self._waves_request(LOGIN_LOG_URL, "POST", header, data={}, cookie=token)
+
+    def _request_timeout(self, client: httpx.AsyncClient, remaining: Optional[float]) -> Dict[str, Any]:
+        """有截止时间时把单次请求的超时限制在剩余时间内"""
+        if remaining is None:
+            return {}
+        timeout = client.timeout
+        return {
+            "timeout": httpx.Timeout(
+                min(timeout.read or remaining, remaining),
+                connect=min(timeout.connect or remaining, remaining),
+            )
+        }
+
+    def _parse_response(self, resp: httpx.Response) -> KuroApiResp[Any]:
+        try:
+            raw_data = resp.json()
+        except Exception:
+            raw_data = {"code": -999, "data": resp.text}
+
+        if isinstance(raw_data, dict):
+            try:
+                raw_data["data"] = json.loads(raw_data.get("data", ""))
+            except Exception:
+                pass
+        logger.debug(f"url:[{resp.request.url}] status:[{resp.status_code}] raw_data:{raw_data}")
+        return KuroApiResp[Any].model_validate(raw_data)
 
     async def _waves_request(
         self,
@@ -174,43 +473,66 @@ class WavesApi:
         params: Optional[Dict[str, Any]] = None,
         json_data: Optional[Dict[str, Any]] = None,
         data: Optional[Dict[str, Any]] = None,
-        max_retries: int = 3,
-        retry_delay: float = 1.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        cookie: Optional[str] = None,
     ) -> KuroApiResp[Union[str, Dict[str, Any]]]:
         if header is None:
             header = await get_base_header()
+        url = self._resolve_url(url)
+        endpoint = endpoint_name(url)
+        policy = retry_policy or DEFAULT_RETRY_POLICY
+
+        attempt = 0
+        while True:
+            if not await self.governor.acquire(endpoint):
+                return KuroApiResp[Any].err("接口熔断中，请稍后再试", code=-999)
+            remaining = get_remaining_time()
+            if remaining is not None and remaining <= 0:
+                API_CALLS.inc(endpoint=endpoint, code="deadline")
+                return KuroApiResp[Any].err("请求超时，已超出本次检查的时间限制", code=-999)
 
-        for attempt in range(max_retries):
+            client = self._get_client()
             try:
-                async with httpx.AsyncClient(verify=self.ssl_verify, timeout=10) as client:
-                    resp = await client.request(
-                        method,
-                        url,
-                        headers=header,
-                        params=params,
-                        json=json_data,
-                        data=data,
-                    )
-                try:
-                    raw_data = resp.json()
-                except Exception:
-                    raw_data = {"code": -999, "data": resp.text}
-
-                if isinstance(raw_data, dict):
-                    try:
-                        raw_data["data"] = json.loads(raw_data.get("data", ""))
-                    except Exception:
-                        pass
-                logger.debug(
-                    f"url:[{url}] params:[{params}] headers:[{header}] data:[{data}] raw_data:{raw_data}"
+                resp = await client.request(
+                    method,
+                    url,
+                    headers=header,
+                    params=params,
+                    json=json_data,
+                    data=data,
+                    **self._request_timeout(client, remaining),
                 )
-                return KuroApiResp[Any].model_validate(raw_data)
+                resp_data = self._parse_response(resp)
             except Exception as e:
+                API_CALLS.inc(endpoint=endpoint, code="error")
+                # 连接失败、超时计为失败；其他异常与服务端状态无关，不计入熔断统计
+                if isinstance(e, (httpx.TransportError, httpx.TimeoutException)):
+                    self.governor.record(endpoint, True)
                 logger.exception(f"url:[{url}] attempt {attempt + 1} failed", e)
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
+                retryable = policy.should_retry_exception(e)
+                result = KuroApiResp[Any].err(ThrowMsg.SERVER_ERROR if retryable else "请求服务器失败", code=-999)
+            else:
+                API_CALLS.inc(endpoint=endpoint, code=resp_data.code)
+                self.governor.record(endpoint, is_throttle_response(resp.status_code, resp_data))
+                if cookie and (resp_data.is_token_invalid or resp_data.is_bat_token_invalid):
+                    self.invalidate_cookie(cookie)
+                retryable = policy.should_retry_status(resp.status_code)
+                result = resp_data
 
-        return KuroApiResp[Any].err("请求服务器失败，已达最大重试次数", code=-999)
+            attempt += 1
+            if not retryable or attempt >= policy.max_attempts:
+                return result
+            delay = policy.backoff(attempt - 1)
+            remaining = get_remaining_time()
+            if remaining is not None and delay >= remaining:
+                return result
+            API_RETRIES.inc(endpoint=endpoint)
+            await asyncio.sleep(delay)
 
 
 waves_api = WavesApi()
+
+
+@on_core_shutdown
+async def _close_waves_api():
+    await waves_api.close()
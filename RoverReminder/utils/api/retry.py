@@ -0,0 +1,66 @@
+import time
+import random
+from dataclasses import dataclass
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Awaitable
+
+import httpx
+
+_deadline: ContextVar[Optional[float]] = ContextVar("roverreminder_request_deadline", default=None)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """指数退避加全抖动的重试策略，只重试有机会成功的错误"""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次（从 0 开始）失败后的等待秒数"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def should_retry_exception(self, error: BaseException) -> bool:
+        # 连接失败、超时、连接被中断可以重试；请求构造错误、解码错误等重试也不会成功
+        return isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+    def should_retry_status(self, status_code: int) -> bool:
+        return status_code >= 500
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """限制上下文内所有接口请求（含重试）的总时长，嵌套时取更早的截止时间"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time() -> Optional[float]:
+    """距离截止时间的剩余秒数，未设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+async def run_with_deadline(factory: Callable[[], Awaitable[Any]], deadline: Optional[float]) -> Any:
+    """在给定截止时间下执行，用于在独立上下文中运行的任务"""
+    if deadline is not None:
+        _deadline.set(deadline)
+    return await factory()
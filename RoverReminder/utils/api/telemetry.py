@@ -0,0 +1,67 @@
+import sys
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Deque, Optional
+
+from gsuid_core.logger import logger
+
+# 每个状态码首次出现及此后每 SAMPLE_EVERY 次记录一次调用栈
+SAMPLE_EVERY = 100
+RECENT_LIMIT = 50
+CALLER_DEPTH = 3
+
+_SKIP_MODULE_PREFIXES = ("pydantic", __name__)
+
+
+def _capture_callers(depth: int = CALLER_DEPTH) -> List[str]:
+    """沿调用帧向上收集业务函数名，不读取源码上下文"""
+    callers: List[str] = []
+    frame = sys._getframe(1)
+    while frame is not None and len(callers) < depth:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_SKIP_MODULE_PREFIXES) and not module.endswith(".request_util"):
+            callers.append(frame.f_code.co_name)
+        frame = frame.f_back
+    return callers[::-1]
+
+
+class ApiErrorTelemetry:
+    """统计非预期的接口状态码，并抽样保留最近的异常详情"""
+
+    def __init__(self, sample_every: int = SAMPLE_EVERY, recent_limit: int = RECENT_LIMIT) -> None:
+        self.sample_every = max(1, sample_every)
+        self._counts: Counter = Counter()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent_limit)
+
+    def record(self, code: int, msg: str, data: Optional[Any] = None) -> bool:
+        """记录一次异常状态码，返回本次是否被抽样"""
+        self._counts[code] += 1
+        count = self._counts[code]
+        if count != 1 and count % self.sample_every != 0:
+            return False
+
+        callers = _capture_callers()
+        self._recent.append(
+            {
+                "time": int(time.time()),
+                "code": code,
+                "msg": msg,
+                "data": repr(data)[:200],
+                "callers": callers,
+                "count": count,
+            }
+        )
+        logger.warning(f"[体力推送·UID工具] {'.'.join(callers)} code: {code} msg: {msg} data: {data} count: {count}")
+        return True
+
+    def get_counts(self) -> Dict[int, int]:
+        return dict(self._counts)
+
+    def get_total(self) -> int:
+        return sum(self._counts.values())
+
+    def get_recent(self) -> List[Dict[str, Any]]:
+        return list(self._recent)
+
+
+api_error_telemetry = ApiErrorTelemetry()
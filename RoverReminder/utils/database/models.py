@@ -1,17 +1,48 @@
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import Any, Dict, List, Tuple, Optional, Sequence, Type, TypeVar
 
 from sqlmodel import Field, col, select
-from sqlalchemy import delete, null, update
+from sqlalchemy import Index, case, func, delete, inspect, null, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import and_
+from sqlalchemy.sql import or_, and_
 
 from gsuid_core.logger import logger
+from gsuid_core.utils.database.startup import exec_list
 from gsuid_core.utils.database.base_models import Bind, User, BaseModel, with_session
 
 T_WavesBind = TypeVar("T_WavesBind", bound="WavesBind")
 T_WavesUser = TypeVar("T_WavesUser", bound="WavesUser")
 T_WavesStaminaRecord = TypeVar("T_WavesStaminaRecord", bound="WavesStaminaRecord")
 
+# IN 查询分批大小，避免超出 SQLite 参数数量限制
+QUERY_CHUNK_SIZE = 500
+
+# 体力记录的唯一键
+RECORD_KEY_COLUMNS = ("uid", "user_id", "bot_id")
+
+# 已存在的表不会自动补建索引，启动时补充执行
+exec_list.extend(
+    [
+        'CREATE INDEX IF NOT EXISTS ix_WavesStaminaRecord_push_scan ON "WavesStaminaRecord" '
+        "(stamina_push_switch, email_fail_count, email_last_success_time)",
+    ]
+)
+
+RECORD_KEY_INDEX = "ux_WavesStaminaRecord_key"
+
+
+def _get_dialect_insert(session: AsyncSession):
+    """返回支持 ON CONFLICT 的方言 insert，其余数据库返回 None"""
+    dialect = session.bind.dialect.name if session.bind is not None else ""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert
+    return None
+
 
 class WavesBind(Bind, table=True):
     __table_args__: Dict[str, Any] = {"extend_existing": True}
@@ -92,6 +123,61 @@ class WavesUser(User, table=True):
         data = result.scalars().all()
         return data[0] if data else None
 
+    @classmethod
+    @with_session
+    async def select_by_uids(
+        cls: Type[T_WavesUser],
+        session: AsyncSession,
+        uids: Sequence[str],
+        game_id: Optional[int] = None,
+    ) -> List[T_WavesUser]:
+        """批量查询多个uid的全部账号记录"""
+        uid_list = sorted(set(uids))
+        users: List[T_WavesUser] = []
+        for i in range(0, len(uid_list), QUERY_CHUNK_SIZE):
+            filters: List[Any] = [col(cls.uid).in_(uid_list[i : i + QUERY_CHUNK_SIZE])]
+            if game_id is not None:
+                filters.append(cls.game_id == game_id)
+            result = await session.execute(select(cls).where(*filters))
+            users.extend(result.scalars().all())
+        return users
+
+    @classmethod
+    @with_session
+    async def bulk_update_last_used_time(
+        cls,
+        session: AsyncSession,
+        items: Dict[Tuple[str, str, str, Optional[int]], int],
+    ) -> int:
+        """批量更新最后使用时间，items 为 (uid, user_id, bot_id, game_id) -> 时间戳
+
+        与 update_last_used_time 一致，每个键只更新查到的第一条记录，且该记录需有 cookie。
+        """
+        updated = 0
+        for (uid, user_id, bot_id, game_id), used_time in items.items():
+            filters: List[Any] = [
+                cls.user_id == user_id,
+                cls.uid == uid,
+                cls.bot_id == bot_id,
+            ]
+            if game_id is not None:
+                filters.append(cls.game_id == game_id)
+            result = await session.execute(select(func.min(cls.id)).where(*filters))
+            row_id = result.scalar()
+            if row_id is None:
+                continue
+            sql = (
+                update(cls)
+                .where(cls.id == row_id, col(cls.cookie) != "")
+                .values(
+                    last_used_time=used_time,
+                    created_time=func.coalesce(cls.created_time, used_time),
+                )
+            )
+            result = await session.execute(sql)
+            updated += result.rowcount
+        return updated
+
     @classmethod
     @with_session
     async def update_last_used_time(
@@ -128,7 +214,16 @@ class WavesStaminaRecord(BaseModel, table=True):
     """体力查询记录表"""
 
     __tablename__ = "WavesStaminaRecord"
-    __table_args__: Dict[str, Any] = {"extend_existing": True}
+    __table_args__: Tuple[Any, ...] = (
+        Index(RECORD_KEY_INDEX, *RECORD_KEY_COLUMNS, unique=True),
+        Index(
+            "ix_WavesStaminaRecord_push_scan",
+            "stamina_push_switch",
+            "email_fail_count",
+            "email_last_success_time",
+        ),
+        {"extend_existing": True},
+    )
 
     uid: str = Field(default="", title="鸣潮UID")
     bot_self_id: str = Field(default="", title="BotSelfID")
@@ -143,6 +238,83 @@ class WavesStaminaRecord(BaseModel, table=True):
     stamina_threshold: Optional[int] = Field(default=None, title="体力阈值")
     is_ck_valid: Optional[bool] = Field(default=None, title="CK是否有效")
 
+    @classmethod
+    @with_session
+    async def migrate_unique_key(cls: Type[T_WavesStaminaRecord], session: AsyncSession) -> int:
+        """旧表缺少唯一索引时清理重复记录并补建索引，返回删除的记录数
+
+        此前的读写都经 .first() 落在 id 最小的一条上，因此保留每个键 id 最小的记录。
+        """
+        conn = await session.connection()
+        indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes(cls.__tablename__))
+        if any(index["name"] == RECORD_KEY_INDEX for index in indexes):
+            return 0
+
+        # 多包一层子查询，MySQL 不允许 DELETE 的子查询直接读取同一张表
+        keep = (
+            select(func.min(cls.id).label("id"))
+            .group_by(*(getattr(cls, name) for name in RECORD_KEY_COLUMNS))
+            .subquery("keep")
+        )
+        result = await session.execute(delete(cls).where(col(cls.id).not_in(select(keep.c.id))))
+        index = next(index for index in cls.__table__.indexes if index.name == RECORD_KEY_INDEX)  # type: ignore
+        await conn.run_sync(index.create)
+        deleted = max(result.rowcount or 0, 0)
+        logger.info(f"[体力推送·数据库] 已补建体力记录唯一索引，清理重复记录 {deleted} 条")
+        return deleted
+
+    @classmethod
+    def _row_values(cls, **data) -> Dict[str, Any]:
+        """补全模型默认值，生成可直接用于 INSERT 的整行数据"""
+        row = cls(**data)
+        return {c.name: getattr(row, c.name) for c in cls.__table__.columns if c.name != "id"}  # type: ignore
+
+    @classmethod
+    async def _upsert(
+        cls: Type[T_WavesStaminaRecord],
+        session: AsyncSession,
+        user_id: str,
+        bot_id: str,
+        uid: str,
+        values: Dict[str, Any],
+    ) -> None:
+        """按 (user_id, bot_id, uid) 写入记录，SQLite/PostgreSQL 使用单条 INSERT ... ON CONFLICT"""
+        insert = _get_dialect_insert(session)
+        if insert is None:
+            sql = select(cls).where(
+                and_(
+                    cls.user_id == user_id,
+                    cls.bot_id == bot_id,
+                    cls.uid == uid,
+                )
+            )
+            result = await session.execute(sql)
+            record = result.scalars().first()
+            if record:
+                for k, v in values.items():
+                    setattr(record, k, v)
+                session.add(record)
+            else:
+                session.add(cls(user_id=user_id, bot_id=bot_id, uid=uid, **values))
+            return
+
+        row = cls._row_values(user_id=user_id, bot_id=bot_id, uid=uid, **values)
+        sql = insert(cls).values(**row)
+        sql = sql.on_conflict_do_update(index_elements=list(RECORD_KEY_COLUMNS), set_=values)
+        await session.execute(sql)
+
+    @classmethod
+    @with_session
+    async def bulk_upsert(
+        cls: Type[T_WavesStaminaRecord],
+        session: AsyncSession,
+        items: Dict[Tuple[str, str, str], Dict[str, Any]],
+    ) -> bool:
+        """在同一事务中写入多条记录，items 为 (user_id, bot_id, uid) -> 待更新字段"""
+        for (user_id, bot_id, uid), values in items.items():
+            await cls._upsert(session, user_id, bot_id, uid, values)
+        return True
+
     @classmethod
     @with_session
     async def upsert_stamina_query(
@@ -156,34 +328,17 @@ class WavesStaminaRecord(BaseModel, table=True):
         mr_value: Optional[int],
         is_ck_valid: Optional[bool],
     ) -> bool:
-        sql = select(cls).where(
-            and_(
-                cls.user_id == user_id,
-                cls.bot_id == bot_id,
-                cls.uid == uid,
-            )
-        )
-        result = await session.execute(sql)
-        record = result.scalars().first()
-
-        if record:
-            record.bot_self_id = bot_self_id
-            record.mr_query_time = mr_query_time
-            record.mr_value = mr_value
-            record.is_ck_valid = is_ck_valid
-            session.add(record)
-            return True
-
-        session.add(
-            cls(
-                user_id=user_id,
-                bot_id=bot_id,
-                bot_self_id=bot_self_id,
-                uid=uid,
-                mr_query_time=mr_query_time,
-                mr_value=mr_value,
-                is_ck_valid=is_ck_valid,
-            )
+        await cls._upsert(
+            session,
+            user_id,
+            bot_id,
+            uid,
+            {
+                "bot_self_id": bot_self_id,
+                "mr_query_time": mr_query_time,
+                "mr_value": mr_value,
+                "is_ck_valid": is_ck_valid,
+            },
         )
         return True
 
@@ -198,30 +353,12 @@ class WavesStaminaRecord(BaseModel, table=True):
         uid: str,
         is_ck_valid: bool,
     ) -> bool:
-        sql = select(cls).where(
-            and_(
-                cls.user_id == user_id,
-                cls.bot_id == bot_id,
-                cls.uid == uid,
-            )
-        )
-        result = await session.execute(sql)
-        record = result.scalars().first()
-
-        if record:
-            record.bot_self_id = bot_self_id
-            record.is_ck_valid = is_ck_valid
-            session.add(record)
-            return True
-
-        session.add(
-            cls(
-                user_id=user_id,
-                bot_id=bot_id,
-                bot_self_id=bot_self_id,
-                uid=uid,
-                is_ck_valid=is_ck_valid,
-            )
+        await cls._upsert(
+            session,
+            user_id,
+            bot_id,
+            uid,
+            {"bot_self_id": bot_self_id, "is_ck_valid": is_ck_valid},
         )
         return True
 
@@ -239,38 +376,15 @@ class WavesStaminaRecord(BaseModel, table=True):
         email_fail_count: int,
         email_last_success_time: Optional[int] = None,
     ) -> bool:
-        sql = select(cls).where(
-            and_(
-                cls.user_id == user_id,
-                cls.bot_id == bot_id,
-                cls.uid == uid,
-            )
-        )
-        result = await session.execute(sql)
-        record = result.scalars().first()
-
-        if record:
-            record.bot_self_id = bot_self_id
-            record.email_last_try_time = email_last_try_time
-            record.email_send_success = email_send_success
-            record.email_fail_count = email_fail_count
-            if email_last_success_time is not None:
-                record.email_last_success_time = email_last_success_time
-            session.add(record)
-            return True
-
-        session.add(
-            cls(
-                user_id=user_id,
-                bot_id=bot_id,
-                bot_self_id=bot_self_id,
-                uid=uid,
-                email_last_try_time=email_last_try_time,
-                email_send_success=email_send_success,
-                email_fail_count=email_fail_count,
-                email_last_success_time=email_last_success_time,
-            )
-        )
+        values: Dict[str, Any] = {
+            "bot_self_id": bot_self_id,
+            "email_last_try_time": email_last_try_time,
+            "email_send_success": email_send_success,
+            "email_fail_count": email_fail_count,
+        }
+        if email_last_success_time is not None:
+            values["email_last_success_time"] = email_last_success_time
+        await cls._upsert(session, user_id, bot_id, uid, values)
         return True
 
     @classmethod
@@ -284,33 +398,10 @@ class WavesStaminaRecord(BaseModel, table=True):
         uid: str,
         **data,
     ) -> bool:
-        sql = select(cls).where(
-            and_(
-                cls.user_id == user_id,
-                cls.bot_id == bot_id,
-                cls.uid == uid,
-            )
-        )
-        result = await session.execute(sql)
-        record = result.scalars().first()
-
-        if record:
-            record.bot_self_id = bot_self_id
-            for k, v in data.items():
-                if hasattr(record, k):
-                    setattr(record, k, v)
-            session.add(record)
-            return True
-
-        session.add(
-            cls(
-                user_id=user_id,
-                bot_id=bot_id,
-                bot_self_id=bot_self_id,
-                uid=uid,
-                **data,
-            )
-        )
+        values: Dict[str, Any] = {"bot_self_id": bot_self_id}
+        columns = cls.__table__.columns  # type: ignore
+        values.update({k: v for k, v in data.items() if k in columns and k not in RECORD_KEY_COLUMNS})
+        await cls._upsert(session, user_id, bot_id, uid, values)
         return True
 
     @classmethod
@@ -344,6 +435,64 @@ class WavesStaminaRecord(BaseModel, table=True):
         data = result.scalars().all()
         return list(data) if data else []
 
+    @classmethod
+    @with_session
+    async def get_push_candidates(
+        cls: Type[T_WavesStaminaRecord],
+        session: AsyncSession,
+        threshold_default: int,
+        now_ts: int,
+        cooldown_horizon: int = 0,
+        keys: Optional[Sequence[Tuple[str, str, str]]] = None,
+    ) -> List[T_WavesStaminaRecord]:
+        """查询可推送的记录：推送开启、已设置邮箱、未被熔断，且冷却将在 now_ts + cooldown_horizon 前结束"""
+        threshold = case(
+            (or_(col(cls.stamina_threshold).is_(None), col(cls.stamina_threshold) == 0), threshold_default),
+            else_=col(cls.stamina_threshold),
+        )
+        threshold = case((threshold < 120, 120), (threshold > 240, 240), else_=threshold)
+        # 冷却小时数为 threshold // 10 - 1，这里避免使用各数据库行为不一致的整数除法
+        cooldown_seconds = (threshold - threshold % 10) * 360 - 3600
+        filters: List[Any] = [
+            col(cls.uid) != "",
+            col(cls.stamina_push_switch) == "on",
+            col(cls.user_email) != "",
+            or_(col(cls.email_fail_count).is_(None), col(cls.email_fail_count) < 5),
+            or_(
+                col(cls.email_last_success_time).is_(None),
+                col(cls.email_last_success_time) + cooldown_seconds <= now_ts + cooldown_horizon,
+            ),
+        ]
+        if keys is None:
+            result = await session.execute(select(cls).where(*filters))
+            return list(result.scalars().all())
+
+        wanted = set(keys)
+        uids = sorted({uid for _, _, uid in wanted})
+        records: List[T_WavesStaminaRecord] = []
+        for i in range(0, len(uids), QUERY_CHUNK_SIZE):
+            sql = select(cls).where(*filters, col(cls.uid).in_(uids[i : i + QUERY_CHUNK_SIZE]))
+            result = await session.execute(sql)
+            records.extend(r for r in result.scalars().all() if (r.user_id, r.bot_id, r.uid) in wanted)
+        return records
+
+    @classmethod
+    @with_session
+    async def get_records_by_keys(
+        cls: Type[T_WavesStaminaRecord],
+        session: AsyncSession,
+        keys: Sequence[Tuple[str, str, str]],
+    ) -> List[T_WavesStaminaRecord]:
+        """按 (user_id, bot_id, uid) 批量查询记录"""
+        wanted = set(keys)
+        uids = sorted({uid for _, _, uid in wanted})
+        records: List[T_WavesStaminaRecord] = []
+        for i in range(0, len(uids), QUERY_CHUNK_SIZE):
+            sql = select(cls).where(col(cls.uid).in_(uids[i : i + QUERY_CHUNK_SIZE]))
+            result = await session.execute(sql)
+            records.extend(r for r in result.scalars().all() if (r.user_id, r.bot_id, r.uid) in wanted)
+        return records
+
     @classmethod
     @with_session
     async def delete_by_uid(
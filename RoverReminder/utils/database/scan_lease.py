@@ -0,0 +1,139 @@
+from typing import Any, List, Tuple, Sequence, Type, TypeVar
+
+from sqlmodel import Field, col, select
+from sqlalchemy import Index, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from gsuid_core.utils.database.base_models import BaseIDModel, with_session
+
+from .models import _get_dialect_insert
+
+T_WavesScanLease = TypeVar("T_WavesScanLease", bound="WavesScanLease")
+
+
+class WavesScanLease(BaseIDModel, table=True):
+    """多实例扫描的分片租约与实例心跳，name 为 shard:<序号> 或 node:<实例ID>"""
+
+    __tablename__ = "WavesScanLease"
+    __table_args__: Tuple[Any, ...] = (
+        Index("ux_WavesScanLease_name", "name", unique=True),
+        {"extend_existing": True},
+    )
+
+    name: str = Field(default="", title="租约名称")
+    owner: str = Field(default="", title="持有实例")
+    expires_at: int = Field(default=0, title="过期时间")
+
+    @classmethod
+    @with_session
+    async def ensure_rows(cls: Type[T_WavesScanLease], session: AsyncSession, names: Sequence[str]) -> bool:
+        """补齐缺失的租约行，已存在的行保持不变"""
+        insert = _get_dialect_insert(session)
+        if insert is not None:
+            for name in names:
+                await session.execute(insert(cls).values(name=name, owner="", expires_at=0).on_conflict_do_nothing())
+            return True
+
+        result = await session.execute(select(cls.name).where(col(cls.name).in_(list(names))))
+        existing = set(result.scalars().all())
+        session.add_all(cls(name=name, owner="", expires_at=0) for name in names if name not in existing)
+        return True
+
+    @classmethod
+    @with_session
+    async def get_all(cls: Type[T_WavesScanLease], session: AsyncSession) -> List[T_WavesScanLease]:
+        result = await session.execute(select(cls))
+        return list(result.scalars().all())
+
+    @classmethod
+    @with_session
+    async def heartbeat(
+        cls: Type[T_WavesScanLease],
+        session: AsyncSession,
+        name: str,
+        owner: str,
+        expires_at: int,
+    ) -> bool:
+        """写入实例心跳，SQLite/PostgreSQL 使用单条 INSERT ... ON CONFLICT"""
+        insert = _get_dialect_insert(session)
+        if insert is not None:
+            sql = insert(cls).values(name=name, owner=owner, expires_at=expires_at)
+            sql = sql.on_conflict_do_update(index_elements=["name"], set_={"owner": owner, "expires_at": expires_at})
+            await session.execute(sql)
+            return True
+
+        result = await session.execute(
+            update(cls).where(col(cls.name) == name).values(owner=owner, expires_at=expires_at)
+        )
+        if not result.rowcount:
+            session.add(cls(name=name, owner=owner, expires_at=expires_at))
+        return True
+
+    @classmethod
+    @with_session
+    async def try_acquire(
+        cls: Type[T_WavesScanLease],
+        session: AsyncSession,
+        name: str,
+        owner: str,
+        expires_at: int,
+        now: int,
+    ) -> bool:
+        """租约已过期或本就属于该实例时取得租约，依靠条件更新保证只有一个实例成功"""
+        sql = (
+            update(cls)
+            .where(col(cls.name) == name)
+            .where((col(cls.owner) == owner) | (col(cls.expires_at) < now))
+            .values(owner=owner, expires_at=expires_at)
+        )
+        result = await session.execute(sql)
+        return result.rowcount == 1
+
+    @classmethod
+    @with_session
+    async def renew(
+        cls: Type[T_WavesScanLease],
+        session: AsyncSession,
+        names: Sequence[str],
+        owner: str,
+        expires_at: int,
+    ) -> List[str]:
+        """续期仍由该实例持有的租约，返回续期成功的租约名"""
+        if not names:
+            return []
+        await session.execute(
+            update(cls)
+            .where(col(cls.name).in_(list(names)))
+            .where(col(cls.owner) == owner)
+            .values(expires_at=expires_at)
+        )
+        result = await session.execute(
+            select(cls.name).where(col(cls.name).in_(list(names))).where(col(cls.owner) == owner)
+        )
+        return list(result.scalars().all())
+
+    @classmethod
+    @with_session
+    async def release(cls: Type[T_WavesScanLease], session: AsyncSession, names: Sequence[str], owner: str) -> bool:
+        if not names:
+            return True
+        await session.execute(
+            update(cls)
+            .where(col(cls.name).in_(list(names)))
+            .where(col(cls.owner) == owner)
+            .values(owner="", expires_at=0)
+        )
+        return True
+
+    @classmethod
+    @with_session
+    async def delete_expired(
+        cls: Type[T_WavesScanLease],
+        session: AsyncSession,
+        prefix: str,
+        before: int,
+    ) -> int:
+        result = await session.execute(
+            delete(cls).where(col(cls.name).startswith(prefix)).where(col(cls.expires_at) < before)
+        )
+        return result.rowcount
@@ -1,13 +1,18 @@
-from typing import Any, Dict, Optional, Type, TypeVar
+from typing import Any, Dict, List, Tuple, Optional, Sequence, Type, TypeVar
 
-from sqlmodel import Field, select
+from sqlmodel import Field, col, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import and_, or_
 
 from gsuid_core.utils.database.base_models import BaseBotIDModel, with_session
 
+from .models import QUERY_CHUNK_SIZE
+
 T_WavesUserActivity = TypeVar("T_WavesUserActivity", bound="WavesUserActivity")
 
+# (user_id, bot_id, bot_self_id)
+ActivityKey = Tuple[str, str, str]
+
 
 class WavesUserActivity(BaseBotIDModel, table=True):
     """用户活跃度记录表"""
@@ -51,6 +56,38 @@ class WavesUserActivity(BaseBotIDModel, table=True):
         legacy = legacy_result.scalars().first()
         return legacy.last_active_time if legacy else None
 
+    @classmethod
+    @with_session
+    async def get_last_active_times(
+        cls: Type[T_WavesUserActivity],
+        session: AsyncSession,
+        keys: Sequence[ActivityKey],
+    ) -> Dict[ActivityKey, Optional[int]]:
+        """批量查询最后活跃时间，匹配规则与 get_user_last_active_time 一致"""
+        wanted = set(keys)
+        user_ids = sorted({user_id for user_id, _, _ in wanted})
+        rows: List[T_WavesUserActivity] = []
+        for i in range(0, len(user_ids), QUERY_CHUNK_SIZE):
+            sql = select(cls).where(col(cls.user_id).in_(user_ids[i : i + QUERY_CHUNK_SIZE]))
+            result = await session.execute(sql)
+            rows.extend(result.scalars().all())
+
+        exact: Dict[ActivityKey, Optional[int]] = {}
+        legacy: Dict[Tuple[str, str], Optional[int]] = {}
+        for row in rows:
+            exact.setdefault((row.user_id, row.bot_id, row.bot_self_id), row.last_active_time)
+            if not row.bot_self_id:
+                legacy.setdefault((row.user_id, row.bot_id), row.last_active_time)
+
+        data: Dict[ActivityKey, Optional[int]] = {}
+        for key in wanted:
+            user_id, _, bot_self_id = key
+            if key in exact:
+                data[key] = exact[key]
+            else:
+                data[key] = legacy.get((user_id, bot_self_id))
+        return data
+
     @classmethod
     @with_session
     async def is_user_active(
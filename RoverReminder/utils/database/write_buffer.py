@@ -0,0 +1,148 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from typing import Any, Set, Dict, Tuple, Optional, AsyncIterator
+
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
+
+from ..metrics import stage_timer
+from .models import WavesUser, WavesStaminaRecord
+
+# (user_id, bot_id, uid)
+RecordKey = Tuple[str, str, str]
+# (uid, user_id, bot_id, game_id)
+UserKey = Tuple[str, str, str, Optional[int]]
+
+# 累计到该数量的待写记录或距首次写入超过该秒数时批量提交
+FLUSH_EVERY = 50
+FLUSH_INTERVAL = 5.0
+
+_active_buffer: ContextVar[Optional["StaminaWriteBuffer"]] = ContextVar("roverreminder_write_buffer", default=None)
+_live_buffers: Set["StaminaWriteBuffer"] = set()
+
+
+class StaminaWriteBuffer:
+    """合并同一记录的多次写入，按数量或时间批量在一个事务中提交"""
+
+    def __init__(self, flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._records: Dict[RecordKey, Dict[str, Any]] = {}
+        self._last_used: Dict[UserKey, int] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._records) + len(self._last_used)
+
+    def stage_record(self, user_id: str, bot_id: str, uid: str, values: Dict[str, Any]) -> None:
+        self._records.setdefault((user_id, bot_id, uid), {}).update(values)
+        self._after_stage()
+
+    def stage_last_used(self, uid: str, user_id: str, bot_id: str, game_id: Optional[int], used_time: int) -> None:
+        self._last_used[(uid, user_id, bot_id, game_id)] = used_time
+        self._after_stage()
+
+    def _after_stage(self) -> None:
+        if len(self) >= self.flush_every:
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._safe_flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self._safe_flush()
+
+    async def _safe_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("[体力推送·数据库] 批量写入失败")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            records, self._records = self._records, {}
+            last_used, self._last_used = self._last_used, {}
+            if not records and not last_used:
+                return
+            try:
+                with stage_timer("db_write"):
+                    if records:
+                        await WavesStaminaRecord.bulk_upsert(records)
+                    if last_used:
+                        await WavesUser.bulk_update_last_used_time(last_used)
+            except Exception:
+                # 写入失败时放回缓冲区，保留期间新产生的更新
+                for key, values in records.items():
+                    self._records[key] = {**values, **self._records.get(key, {})}
+                for key, used_time in last_used.items():
+                    self._last_used.setdefault(key, used_time)
+                raise
+
+    async def close(self) -> None:
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        await self.flush()
+
+
+@asynccontextmanager
+async def write_behind() -> AsyncIterator[StaminaWriteBuffer]:
+    """在上下文（及其创建的子任务）内缓冲记录写入，退出时统一提交"""
+    buffer = StaminaWriteBuffer()
+    token = _active_buffer.set(buffer)
+    _live_buffers.add(buffer)
+    try:
+        yield buffer
+    finally:
+        _active_buffer.reset(token)
+        try:
+            await buffer.close()
+        finally:
+            _live_buffers.discard(buffer)
+
+
+async def update_stamina_record(
+    user_id: str,
+    bot_id: str,
+    bot_self_id: str,
+    uid: str,
+    *,
+    flush: bool = False,
+    **values: Any,
+) -> None:
+    """更新体力记录，处于 write_behind 上下文时写入缓冲区，flush 为 True 时立即提交缓冲区"""
+    buffer = _active_buffer.get()
+    if buffer is None:
+        with stage_timer("db_write"):
+            await WavesStaminaRecord.upsert_user_settings(
+                user_id=user_id,
+                bot_id=bot_id,
+                bot_self_id=bot_self_id,
+                uid=uid,
+                **values,
+            )
+        return
+    buffer.stage_record(user_id, bot_id, uid, {"bot_self_id": bot_self_id, **values})
+    if flush:
+        await buffer.flush()
+
+
+async def update_last_used_time(uid: str, user_id: str, bot_id: str, game_id: Optional[int] = None) -> None:
+    buffer = _active_buffer.get()
+    if buffer is None:
+        await WavesUser.update_last_used_time(uid, user_id, bot_id, game_id=game_id)
+        return
+    buffer.stage_last_used(uid, user_id, bot_id, game_id, int(time.time()))
+
+
+@on_core_shutdown
+async def _flush_write_buffers():
+    for buffer in list(_live_buffers):
+        try:
+            await buffer.close()
+        except Exception:
+            logger.exception("[体力推送·数据库] 关闭时批量写入失败")
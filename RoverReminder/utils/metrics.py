@@ -0,0 +1,320 @@
+import time
+import bisect
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple, Iterator, Optional, Sequence
+
+from gsuid_core.logger import logger
+
+LabelValues = Tuple[str, ...]
+
+# 推送流程中计时的各阶段
+PIPELINE_STAGES = ("activity", "ck", "daily_fetch", "base_fetch", "render", "queue_wait", "smtp", "db_write")
+
+# 秒级耗时的默认分桶
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """按标签累加的计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        return list(self._values.items())
+
+
+class Gauge(_Metric):
+    """按标签记录当前值"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        return list(self._values.items())
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """固定分桶的直方图，只保存各桶计数与总和，内存占用与样本数无关"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def items(self) -> List[Tuple[LabelValues, _HistogramSeries]]:
+        return list(self._series.items())
+
+    def summary(self, **labels: Any) -> Dict[str, float]:
+        """返回次数、平均值以及按分桶上界估算的 p50/p99"""
+        series = self._series.get(self._key(labels))
+        if series is None or not series.count:
+            return {"count": 0, "avg": 0.0, "p50": 0.0, "p99": 0.0}
+        return {
+            "count": series.count,
+            "avg": series.sum / series.count,
+            "p50": self._quantile(series, 0.5),
+            "p99": self._quantile(series, 0.99),
+        }
+
+    def _quantile(self, series: _HistogramSeries, q: float) -> float:
+        target = q * series.count
+        seen = 0
+        for index, count in enumerate(series.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已注册")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self) -> List[_Metric]:
+        return list(self._metrics.values())
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "roverreminder_stage_seconds",
+    "Time spent in each stage of the push pipeline",
+    ("stage",),
+)
+API_CALLS = registry.counter(
+    "roverreminder_api_calls",
+    "Kuro API requests by endpoint and response code",
+    ("endpoint", "code"),
+)
+SCAN_RECORDS = registry.counter(
+    "roverreminder_scan_records",
+    "Records handled by the push scan, by result",
+    ("reason",),
+)
+SCAN_CYCLES = registry.counter(
+    "roverreminder_scan_cycles",
+    "Push scan cycles completed",
+)
+SCAN_SECONDS = registry.histogram(
+    "roverreminder_scan_seconds",
+    "Duration of a push scan cycle",
+)
+API_RETRIES = registry.counter(
+    "roverreminder_api_retries",
+    "Kuro API request retries by endpoint",
+    ("endpoint",),
+)
+API_COALESCED = registry.counter(
+    "roverreminder_api_coalesced",
+    "Kuro API calls that joined an identical in-flight request",
+    ("endpoint",),
+)
+API_RATE_LIMIT = registry.gauge(
+    "roverreminder_api_rate_limit",
+    "Current Kuro API request budget per second, 0 when unlimited",
+)
+API_BREAKER_TRIPS = registry.counter(
+    "roverreminder_api_breaker_trips",
+    "Circuit breaker trips by endpoint",
+    ("endpoint",),
+)
+MAIL_SENDS = registry.counter(
+    "roverreminder_mail_sends",
+    "Emails handed to SMTP by provider and result",
+    ("provider", "result"),
+)
+MAIL_QUEUE_DEPTH = registry.gauge(
+    "roverreminder_mail_queue_depth",
+    "Emails waiting in the send queue",
+)
+
+_last_cycle: Dict[str, Any] = {}
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """记录代码块耗时到对应阶段，异常时同样计时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def get_stage_summary(stage: str) -> Dict[str, float]:
+    return STAGE_SECONDS.summary(stage=stage)
+
+
+def record_scan_cycle(scanned: int, reasons: Dict[str, int], api_calls: int, duration: float) -> None:
+    """记录一轮扫描的汇总：处理记录数、各结果数量、接口调用次数与耗时"""
+    SCAN_CYCLES.inc()
+    SCAN_SECONDS.observe(duration)
+    for reason, count in reasons.items():
+        SCAN_RECORDS.inc(count, reason=reason)
+
+    _last_cycle.clear()
+    _last_cycle.update(
+        {
+            "time": int(time.time()),
+            "scanned": scanned,
+            "reasons": dict(reasons),
+            "api_calls": api_calls,
+            "duration": duration,
+        }
+    )
+    summaries = {stage: get_stage_summary(stage) for stage in PIPELINE_STAGES}
+    stages = " ".join(
+        f"{stage}={summary['avg'] * 1000:.0f}ms" for stage, summary in summaries.items() if summary["count"]
+    )
+    logger.debug(
+        f"[体力推送·统计] 本轮检查 记录数={scanned} 接口调用={api_calls} 耗时={duration:.2f}s "
+        f"结果={dict(reasons)} 各阶段累计平均耗时: {stages}"
+    )
+
+
+def get_last_cycle() -> Optional[Dict[str, Any]]:
+    return dict(_last_cycle) if _last_cycle else None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _format_bound(bound: float) -> str:
+    # 分桶上界统一输出为浮点形式（le="1.0"），与其他客户端库一致，保证同一桶的标签值不变
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _render(metrics: Optional[Sequence[_Metric]], openmetrics: bool) -> List[str]:
+    lines: List[str] = []
+    for metric in registry.collect() if metrics is None else metrics:
+        # OpenMetrics 的计数器族名不带 _total，Prometheus 文本格式中族名与样本名一致
+        family = metric.name if openmetrics or not isinstance(metric, Counter) else f"{metric.name}_total"
+        lines.append(f"# HELP {family} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {family} {metric.kind}")
+        if isinstance(metric, Counter):
+            for values, value in metric.items():
+                lines.append(f"{metric.name}_total{_format_labels(metric.labelnames, values)} {_format_value(value)}")
+        elif isinstance(metric, Gauge):
+            for values, value in metric.items():
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, values)} {_format_value(value)}")
+        elif isinstance(metric, Histogram):
+            for values, series in metric.items():
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), series.counts):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, values, ("le", _format_bound(bound)))
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(series.sum)}")
+                lines.append(f"{metric.name}_count{labels} {series.count}")
+    return lines
+
+
+def render_openmetrics(metrics: Optional[Sequence[_Metric]] = None) -> str:
+    """按 OpenMetrics 文本格式输出指标，用于 /metrics 接口"""
+    return "\n".join(_render(metrics, openmetrics=True) + ["# EOF"]) + "\n"
+
+
+def render_prometheus(metrics: Optional[Sequence[_Metric]] = None) -> str:
+    """按 Prometheus 文本格式（0.0.4）输出指标，用于 node_exporter textfile 采集"""
+    return "\n".join(_render(metrics, openmetrics=False)) + "\n"
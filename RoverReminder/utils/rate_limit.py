@@ -0,0 +1,54 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """令牌桶限速，rate 为每秒补充的令牌数，rate <= 0 时不限速"""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float, capacity: float = 0.0) -> None:
+        self._refill()
+        self.rate = rate
+        if capacity > 0:
+            self.capacity = max(1.0, capacity)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def time_until_available(self, tokens: float = 1.0) -> float:
+        """距离可以取得令牌的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """获取令牌，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                if self.rate <= 0:
+                    break
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+        return time.monotonic() - start
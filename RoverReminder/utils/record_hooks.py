@@ -0,0 +1,21 @@
+from typing import List, Callable, Awaitable
+
+from gsuid_core.logger import logger
+
+RecordChangedHook = Callable[[str, str, str], Awaitable[None]]
+
+# 体力记录配置变更后的回调，由推送模块注册、配置命令触发，两者无需互相导入
+_record_changed_hooks: List[RecordChangedHook] = []
+
+
+def on_record_changed(func: RecordChangedHook) -> RecordChangedHook:
+    _record_changed_hooks.append(func)
+    return func
+
+
+async def notify_record_changed(user_id: str, bot_id: str, uid: str) -> None:
+    for hook in _record_changed_hooks:
+        try:
+            await hook(user_id, bot_id, uid)
+        except Exception:
+            logger.exception(f"[体力推送·配置] 记录变更回调执行失败 uid={uid}")
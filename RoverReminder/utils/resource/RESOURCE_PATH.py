@@ -16,6 +16,9 @@ LOG_PATH = MAIN_PATH / "log"
 # 状态文件
 STATUS_PATH = MAIN_PATH / "status.json"
 
+# Prometheus 文本格式的指标文件
+METRICS_PATH = MAIN_PATH / "metrics.prom"
+
 # 邮件配置
 MAIL_CONFIG_PATH = MAIN_PATH / "mail_config.json"
 
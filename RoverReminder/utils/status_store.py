@@ -1,9 +1,24 @@
 import json
+import asyncio
+import threading
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Dict, Optional
 
+from gsuid_core.aps import scheduler
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
+
+from .util import atomic_write_text
 from .resource.RESOURCE_PATH import STATUS_PATH
 
+# 状态文件保留的天数
+STATUS_RETENTION_DAYS = 30
+STATUS_FLUSH_SECONDS = 60
+
+_status: Optional[Dict[str, Dict[str, int]]] = None
+_dirty = False
+_lock = threading.Lock()
+
 
 def _load_status() -> Dict[str, Dict[str, int]]:
     if not STATUS_PATH.exists():
@@ -19,8 +34,7 @@ def _load_status() -> Dict[str, Dict[str, int]]:
 
 
 def _save_status(data: Dict[str, Dict[str, int]]) -> None:
-    with open(STATUS_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write_text(STATUS_PATH, json.dumps(data, ensure_ascii=False, indent=2))
 
 
 def _today_str() -> str:
@@ -36,31 +50,77 @@ def _ensure_date(data: Dict[str, Dict[str, int]], date_str: str) -> None:
         data[date_str] = {"success": 0, "fail": 0}
 
 
+def _get_status() -> Dict[str, Dict[str, int]]:
+    global _status
+    if _status is None:
+        _status = _load_status()
+    return _status
+
+
+def _prune(data: Dict[str, Dict[str, int]]) -> bool:
+    cutoff = (datetime.now() - timedelta(days=STATUS_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    expired = [date_str for date_str in data if date_str < cutoff]
+    for date_str in expired:
+        del data[date_str]
+    return bool(expired)
+
+
+def _increment(field: str) -> None:
+    global _dirty
+    with _lock:
+        data = _get_status()
+        today = _today_str()
+        _ensure_date(data, today)
+        data[today][field] = data[today].get(field, 0) + 1
+        _dirty = True
+
+
 def record_success() -> None:
-    data = _load_status()
-    today = _today_str()
-    _ensure_date(data, today)
-    data[today]["success"] += 1
-    _save_status(data)
+    _increment("success")
 
 
 def record_fail() -> None:
-    data = _load_status()
-    today = _today_str()
-    _ensure_date(data, today)
-    data[today]["fail"] += 1
-    _save_status(data)
+    _increment("fail")
+
+
+def flush_status() -> None:
+    """把内存中的计数写回状态文件，同时清理超出保留期的日期"""
+    global _dirty
+    with _lock:
+        data = _get_status()
+        if not (_prune(data) or _dirty):
+            return
+        snapshot = {date_str: dict(counts) for date_str, counts in data.items()}
+        _dirty = False
+    try:
+        _save_status(snapshot)
+    except Exception:
+        with _lock:
+            _dirty = True
+        raise
 
 
 def get_today_counts() -> Dict[str, int]:
-    data = _load_status()
-    today = _today_str()
-    _ensure_date(data, today)
-    return data[today]
+    with _lock:
+        return dict(_get_status().get(_today_str(), {"success": 0, "fail": 0}))
 
 
 def get_yesterday_counts() -> Dict[str, int]:
-    data = _load_status()
-    yesterday = _yesterday_str()
-    _ensure_date(data, yesterday)
-    return data[yesterday]
+    with _lock:
+        return dict(_get_status().get(_yesterday_str(), {"success": 0, "fail": 0}))
+
+
+@scheduler.scheduled_job("interval", seconds=STATUS_FLUSH_SECONDS, id="roverreminder_status_flush")
+async def _flush_status_task():
+    try:
+        await asyncio.to_thread(flush_status)
+    except Exception:
+        logger.exception("[体力推送·状态] 状态文件写入失败")
+
+
+@on_core_shutdown
+async def _flush_status_on_shutdown():
+    try:
+        flush_status()
+    except Exception:
+        logger.exception("[体力推送·状态] 状态文件写入失败")
@@ -1,10 +1,15 @@
+import os
 import random
 import string
+import tempfile
+from pathlib import Path
 
 import httpx
 
+DEFAULT_PUBLIC_IP = "127.127.127.127"
 
-async def get_public_ip(host: str = "127.127.127.127") -> str:
+
+async def get_public_ip(host: str = DEFAULT_PUBLIC_IP) -> str:
     try:
         async with httpx.AsyncClient() as client:
             r = await client.get("https://event.kurobbs.com/event/ip", timeout=4)
@@ -32,3 +37,18 @@ async def get_public_ip(host: str = "127.127.127.127") -> str:
 def generate_random_string(length: int = 32) -> str:
     characters = string.ascii_letters + string.digits + string.punctuation
     return "".join(random.choice(characters) for _ in range(length))
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """先写同目录下的临时文件再替换，避免写入中断或读取方读到不完整的内容"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
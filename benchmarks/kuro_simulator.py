@@ -0,0 +1,240 @@
+"""库街区接口本地模拟器
+
+实现插件用到的 requestToken、login/log、refreshData、getData、baseData 接口，响应格式与线上一致
+（data 字段为 JSON 字符串）。支持可配置的延迟分布、按概率注入错误码（220、10903、270、500）
+以及按 uid 确定的体力曲线。
+
+进程内使用：
+
+    simulator = KuroSimulator(SimulatorConfig(latency_ms=30))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=simulator))
+
+独立运行后，将插件配置 KuroApiBaseUrl 设为 http://127.0.0.1:8765 即可指向模拟器：
+
+    python benchmarks/kuro_simulator.py --port 8765 --latency-ms 50 --error 270=0.01
+"""
+
+import json
+import math
+import time
+import zlib
+import random
+import asyncio
+import argparse
+from dataclasses import field, dataclass
+from collections import Counter
+from urllib.parse import parse_qs
+from typing import Any, Dict, Tuple, Optional
+
+REQUEST_TOKEN_PATH = "/aki/roleBox/requestToken"
+LOGIN_LOG_PATH = "/user/login/log"
+REFRESH_PATH = "/aki/roleBox/akiBox/refreshData"
+GAME_DATA_PATH = "/gamer/widget/game3/getData"
+BASE_DATA_PATH = "/aki/roleBox/akiBox/baseData"
+
+ERROR_MESSAGES = {
+    220: "登录已过期，请重新登录",
+    10903: "数据令牌已失效",
+    270: "当前环境存在风险无法进行操作，请切换网络环境后重试",
+    500: "系统繁忙，请稍后再试",
+}
+# 只有携带 b-at 的接口会返回数据令牌失效
+BAT_PATHS = (REFRESH_PATH, GAME_DATA_PATH, BASE_DATA_PATH)
+KNOWN_PATHS = (REQUEST_TOKEN_PATH, LOGIN_LOG_PATH) + BAT_PATHS
+
+STAMINA_MAX = 240
+STAMINA_RECOVER_SECONDS = 360
+# 体力回满后保持满值的步数，之后视为玩家消耗体力并从 0 重新恢复
+STAMINA_HOLD_STEPS = 60
+
+
+@dataclass
+class SimulatorConfig:
+    latency_ms: float = 20.0
+    # fixed / uniform / lognormal
+    latency_dist: str = "lognormal"
+    latency_jitter_ms: float = 10.0
+    # 单次延迟上限，避免长尾分布产生过长的等待
+    latency_cap_ms: float = 5000.0
+    # 错误码 -> 注入概率
+    error_rates: Dict[int, float] = field(default_factory=dict)
+    # 模拟时间流速，大于 1 时体力恢复更快
+    time_scale: float = 1.0
+    seed: int = 0
+
+
+def stamina_at(uid: str, elapsed_seconds: float) -> int:
+    """确定的体力曲线：每 360 秒恢复 1 点，回满保持一段时间后归零"""
+    cycle = STAMINA_MAX + STAMINA_HOLD_STEPS
+    offset = zlib.crc32(uid.encode()) % cycle
+    step = (offset + int(elapsed_seconds // STAMINA_RECOVER_SECONDS)) % cycle
+    return min(STAMINA_MAX, step)
+
+
+class KuroSimulator:
+    """ASGI 应用，可直接交给 httpx.ASGITransport 或 uvicorn 运行"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None) -> None:
+        self.config = config or SimulatorConfig()
+        self.started_at = time.time()
+        self.calls: Counter = Counter()
+        self.codes: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+
+    def elapsed(self) -> float:
+        return (time.time() - self.started_at) * self.config.time_scale
+
+    def _latency(self) -> float:
+        cfg = self.config
+        if cfg.latency_ms <= 0:
+            return 0.0
+        if cfg.latency_dist == "fixed":
+            value = cfg.latency_ms
+        elif cfg.latency_dist == "uniform":
+            value = self._random.uniform(cfg.latency_ms - cfg.latency_jitter_ms, cfg.latency_ms + cfg.latency_jitter_ms)
+        else:
+            # 对数正态分布：均值为 latency_ms，标准差为 latency_jitter_ms
+            sigma = math.sqrt(math.log(1 + (cfg.latency_jitter_ms / cfg.latency_ms) ** 2))
+            value = self._random.lognormvariate(math.log(cfg.latency_ms) - sigma**2 / 2, sigma)
+        return min(max(0.0, value), cfg.latency_cap_ms) / 1000
+
+    def _injected_error(self, path: str) -> Optional[int]:
+        for code, rate in self.config.error_rates.items():
+            if code == 10903 and path not in BAT_PATHS:
+                continue
+            if rate > 0 and self._random.random() < rate:
+                return code
+        return None
+
+    def _envelope(self, data: Any = None, code: int = 200, msg: str = "请求成功") -> Dict[str, Any]:
+        payload = json.dumps(data, ensure_ascii=False) if data is not None else ""
+        return {"code": code, "msg": msg, "data": payload, "success": code == 200}
+
+    def _daily_data(self, role_id: str, server_id: str) -> Dict[str, Any]:
+        return {
+            "gameId": 3,
+            "userId": zlib.crc32(role_id.encode()) % 100000000,
+            "serverId": server_id,
+            "roleId": role_id,
+            "roleName": f"漂泊者{role_id[-4:]}",
+            "signInTxt": "已签到",
+            "hasSignIn": True,
+            "energyData": {
+                "name": "结晶波片",
+                "img": "",
+                "refreshTimeStamp": int(time.time()),
+                "cur": stamina_at(role_id, self.elapsed()),
+                "total": STAMINA_MAX,
+            },
+            "livenessData": {"name": "活跃度", "img": "", "cur": 100, "total": 100},
+            "battlePassData": [{"name": "电台等级", "cur": 30, "total": 70}],
+        }
+
+    def _base_data(self, role_id: str) -> Dict[str, Any]:
+        return {
+            "name": f"漂泊者{role_id[-4:]}",
+            "id": int(role_id) if role_id.isdigit() else 0,
+            "creatTime": 1716134400000,
+            "activeDays": 300,
+            "level": 80,
+            "worldLevel": 8,
+            "roleNum": 40,
+            "achievementCount": 800,
+            "achievementStar": 1500,
+        }
+
+    async def handle(self, path: str, form: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        if path not in KNOWN_PATHS:
+            self.codes[404] += 1
+            return 404, {"code": 404, "msg": "not found", "data": ""}
+
+        self.calls[path] += 1
+        latency = self._latency()
+        if latency:
+            await asyncio.sleep(latency)
+
+        code = self._injected_error(path)
+        if code is not None:
+            self.codes[code] += 1
+            return (500 if code == 500 else 200), self._envelope(code=code, msg=ERROR_MESSAGES[code])
+
+        self.codes[200] += 1
+        role_id = form.get("roleId", "")
+        if path == REQUEST_TOKEN_PATH:
+            return 200, self._envelope({"accessToken": f"sim-{role_id}-{int(self.elapsed())}"})
+        if path == GAME_DATA_PATH:
+            return 200, self._envelope(self._daily_data(role_id, form.get("serverId", "")))
+        if path == BASE_DATA_PATH:
+            return 200, self._envelope(self._base_data(role_id))
+        # login/log 与 refreshData 只关心状态码
+        return 200, self._envelope()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        form = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+
+        status, payload = await self.handle(scope["path"], form)
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(raw)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": raw})
+
+
+def parse_error_rate(value: str) -> Tuple[int, float]:
+    code, rate = value.split("=", 1)
+    return int(code), float(rate)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="库街区接口本地模拟器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--latency-jitter-ms", type=float, default=10)
+    parser.add_argument("--error", action="append", type=parse_error_rate, default=[], help="错误注入，如 270=0.01")
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    simulator = KuroSimulator(
+        SimulatorConfig(
+            latency_ms=args.latency_ms,
+            latency_dist=args.latency_dist,
+            latency_jitter_ms=args.latency_jitter_ms,
+            error_rates=dict(args.error),
+            time_scale=args.time_scale,
+            seed=args.seed,
+        )
+    )
+    uvicorn.run(simulator, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""体力推送扫描基准测试
+
+在临时 SQLite 数据库中生成 N 条体力记录、账号和活跃记录，SMTP 在本地模拟，
+库街区接口由 kuro_simulator 模拟器在进程内提供，
+完整执行扫描周期并输出耗时、数据库查询数、接口调用数、发送邮件数、峰值内存和单条记录延迟分位数。
+
+需在已安装 gsuid_core 的环境中运行，全程不访问网络。导入插件前将 gsuid_core 的资源目录指向临时目录，
+插件的配置、状态和邮件模板文件都写在该目录中，运行结束后删除，不会修改正式环境的数据库和配置文件：
+
+    python benchmarks/scan_benchmark.py --records 10000 --cycles 2
+"""
+
+import sys
+import json
+import time
+import atexit
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Union, Optional
+
+import httpx
+from sqlmodel import SQLModel
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gsuid_core import data_store  # noqa: E402
+
+# 插件导入时会按 get_res_path 创建目录并写入默认配置，需在导入插件前替换
+BENCH_RES_PATH = Path(tempfile.mkdtemp(prefix="roverreminder_bench_"))
+atexit.register(shutil.rmtree, BENCH_RES_PATH, True)
+
+
+def _bench_res_path(_path: Optional[Union[str, List[str]]] = None) -> Path:
+    path = BENCH_RES_PATH
+    if _path:
+        path = path.joinpath(*([_path] if isinstance(_path, str) else _path))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+data_store.get_res_path = _bench_res_path
+
+from gsuid_core.utils.database import base_models  # noqa: E402
+
+import RoverReminder.roverreminder_push as push  # noqa: E402
+from kuro_simulator import KuroSimulator, SimulatorConfig, stamina_at, parse_error_rate  # noqa: E402
+
+from RoverReminder.mail import send  # noqa: E402
+from RoverReminder.mail.mail_config import SmtpProviderConfig  # noqa: E402
+from RoverReminder.utils.api.requests import waves_api  # noqa: E402
+from RoverReminder.utils.api.request_util import header_provider  # noqa: E402
+from RoverReminder.utils.database.models import WavesUser, WavesStaminaRecord  # noqa: E402
+from RoverReminder.utils.database.waves_user_activity import WavesUserActivity  # noqa: E402
+from RoverReminder.roverreminder_config.roverreminder_config import RoverReminderConfig  # noqa: E402
+
+CONFIG_OVERRIDES: Dict[str, Any] = {
+    "EnableStaminaPush": True,
+    "StaminaPushThreshold": 230,
+    "ActiveUserDays": 42,
+    "MailRatePerMinute": 0,
+    "MailDomainRatePerMinute": 0,
+    "MailDomainRateOverrides": "",
+    "ApiMaxRps": 0,
+}
+
+
+class BenchStats:
+    def __init__(self) -> None:
+        self.db_queries = 0
+        self.emails = 0
+        self.latencies: List[float] = []
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        data = sorted(self.latencies)
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+def build_smtp_stub(stats: BenchStats, latency: float):
+    def fake_send(key, msg) -> None:
+        if latency > 0:
+            time.sleep(latency)
+        stats.emails += 1
+
+    return fake_send
+
+
+def patch_config() -> None:
+    original = RoverReminderConfig.get_config
+
+    def get_config(key: str):
+        if key in CONFIG_OVERRIDES:
+            return SimpleNamespace(data=CONFIG_OVERRIDES[key])
+        return original(key)
+
+    RoverReminderConfig.get_config = get_config  # type: ignore[method-assign]
+
+
+async def setup_database(db_path: Path, stats: BenchStats) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(*_):
+        stats.db_queries += 1
+
+    base_models.engine = engine
+    base_models.async_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def seed(records: int, now_ts: int) -> None:
+    """生成记录：约 50% 关闭推送、10% 连续失败，活跃账号约 80%"""
+    stamina_rows, user_rows, activity_rows = [], [], []
+    for i in range(records):
+        uid = str(100000000 + i)
+        user_id = str(10000 + i)
+        bucket = i % 10
+        stamina_rows.append(
+            WavesStaminaRecord(
+                user_id=user_id,
+                bot_id="onebot",
+                bot_self_id="bench",
+                uid=uid,
+                user_email=f"{user_id}@qq.com",
+                stamina_push_switch="off" if bucket < 5 else "on",
+                email_fail_count=5 if bucket == 5 else 0,
+                mr_value=stamina_at(uid, 0) - 20 if i % 3 else None,
+                mr_query_time=now_ts - 3 * 3600,
+            )
+        )
+        user_rows.append(
+            WavesUser(
+                user_id=user_id,
+                bot_id="onebot",
+                uid=uid,
+                cookie=f"cookie-{uid}",
+                did=f"did-{uid}",
+                bat=f"bat-{uid}",
+                status="",
+                game_id=3,
+            )
+        )
+        activity_rows.append(
+            WavesUserActivity(
+                user_id=user_id,
+                bot_id="onebot",
+                bot_self_id="bench",
+                last_active_time=now_ts - (3600 if i % 5 else 90 * 86400),
+            )
+        )
+
+    async with base_models.async_maker() as session:
+        async with session.begin():
+            session.add_all(stamina_rows)
+            session.add_all(user_rows)
+            session.add_all(activity_rows)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stats = BenchStats()
+    patch_config()
+    header_provider._apply_ip("127.0.0.1")
+    simulator = KuroSimulator(
+        SimulatorConfig(
+            latency_ms=args.api_latency_ms,
+            latency_dist="fixed",
+            error_rates=dict(args.error),
+        )
+    )
+    waves_api._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=simulator))
+    send.smtp_pool.send = build_smtp_stub(stats, args.smtp_latency_ms / 1000)  # type: ignore[method-assign]
+    config = SmtpProviderConfig(
+        provider="smtp",
+        host="localhost",
+        port=25,
+        user="bench",
+        password="bench",
+        sender="bench@localhost",
+    )
+    send.mail_config_loader.get = lambda: (config, "")  # type: ignore[method-assign]
+
+    original_handle = push._handle_record
+
+    async def timed_handle(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await original_handle(*a, **kw)
+        finally:
+            stats.latencies.append(time.perf_counter() - start)
+
+    push._handle_record = timed_handle
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await setup_database(Path(tmp) / "bench.db", stats)
+        now_ts = int(time.time())
+        await seed(args.records, now_ts)
+        seed_queries = stats.db_queries
+
+        cycles = []
+        for _ in range(args.cycles):
+            queries_before, emails_before = stats.db_queries, stats.emails
+            api_before = sum(simulator.calls.values())
+            start = time.perf_counter()
+            await push._sync_all_records()
+            keys = push.due_scheduler.pop_due(int(time.time()))
+            if keys:
+                await push._run_due_records(keys)
+            cycles.append(
+                {
+                    "due": len(keys),
+                    "wall_seconds": round(time.perf_counter() - start, 3),
+                    "db_queries": stats.db_queries - queries_before,
+                    "api_calls": sum(simulator.calls.values()) - api_before,
+                    "emails": stats.emails - emails_before,
+                }
+            )
+        await waves_api.close()
+
+    return {
+        "records": args.records,
+        "seed_db_queries": seed_queries,
+        "cycles": cycles,
+        "api_calls_by_path": dict(simulator.calls),
+        "api_codes": dict(simulator.codes),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "record_latency_p50_ms": round(stats.percentile(0.5) * 1000, 2),
+        "record_latency_p99_ms": round(stats.percentile(0.99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RoverReminder 扫描基准测试")
+    parser.add_argument("--records", type=int, default=1000, help="生成的体力记录数量")
+    parser.add_argument("--cycles", type=int, default=1, help="执行的扫描周期数")
+    parser.add_argument("--api-latency-ms", type=float, default=20, help="模拟库街区接口延迟")
+    parser.add_argument("--error", action="append", type=parse_error_rate, default=[], help="接口错误注入，如 270=0.01")
+    parser.add_argument("--smtp-latency-ms", type=float, default=50, help="模拟 SMTP 发送延迟")
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+pytest.importorskip("gsuid_core")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import RoverReminder.roverreminder_push as push  # noqa: E402
+from RoverReminder.utils.api.requests import waves_api  # noqa: E402
+from RoverReminder.utils.api.request_util import KuroApiResp  # noqa: E402
+from RoverReminder.utils.database import write_buffer  # noqa: E402
+from RoverReminder.utils.database.models import WavesUser, WavesStaminaRecord  # noqa: E402
+from RoverReminder.roverreminder_config.roverreminder_config import RoverReminderConfig  # noqa: E402
+
+CONFIG_OVERRIDES: Dict[str, Any] = {
+    "StaminaPushThreshold": 230,
+    "ActiveUserDays": 0,
+    "PushConcurrency": 2,
+}
+
+
+def test_last_used_writes_are_staged_during_due_run(monkeypatch: pytest.MonkeyPatch) -> None:
+    record = WavesStaminaRecord(
+        user_id="10001",
+        bot_id="onebot",
+        bot_self_id="",
+        uid="100000001",
+        user_email="a@example.com",
+        stamina_push_switch="on",
+    )
+    staged: List[tuple] = []
+    direct: List[tuple] = []
+    flushed: List[Dict] = []
+
+    original_get_config = RoverReminderConfig.get_config
+
+    def get_config(key: str):
+        if key in CONFIG_OVERRIDES:
+            return SimpleNamespace(data=CONFIG_OVERRIDES[key])
+        return original_get_config(key)
+
+    async def get_push_candidates(*args: Any, **kwargs: Any) -> List[WavesStaminaRecord]:
+        return [record]
+
+    async def select_by_uids(*args: Any, **kwargs: Any) -> List[WavesUser]:
+        return []
+
+    async def validate_self_ck(uid: str, user_id: str, bot_id: str):
+        return "cookie", True
+
+    async def get_daily_info(uid: str, ck: str):
+        return KuroApiResp.err("请求失败")
+
+    async def update_last_used_time(*args: Any, **kwargs: Any) -> bool:
+        direct.append(args)
+        return True
+
+    async def bulk_update_last_used_time(items: Dict) -> int:
+        flushed.append(dict(items))
+        return len(items)
+
+    async def bulk_upsert(items: Dict) -> None:
+        return None
+
+    original_stage = write_buffer.StaminaWriteBuffer.stage_last_used
+
+    def stage_last_used(self, *args: Any) -> None:
+        staged.append(args)
+        original_stage(self, *args)
+
+    monkeypatch.setattr(RoverReminderConfig, "get_config", get_config)
+    monkeypatch.setattr(WavesStaminaRecord, "get_push_candidates", get_push_candidates)
+    monkeypatch.setattr(WavesStaminaRecord, "bulk_upsert", bulk_upsert)
+    monkeypatch.setattr(WavesUser, "select_by_uids", select_by_uids)
+    monkeypatch.setattr(WavesUser, "update_last_used_time", update_last_used_time)
+    monkeypatch.setattr(WavesUser, "bulk_update_last_used_time", bulk_update_last_used_time)
+    monkeypatch.setattr(waves_api, "_validate_self_ck", validate_self_ck)
+    monkeypatch.setattr(waves_api, "get_daily_info", get_daily_info)
+    monkeypatch.setattr(write_buffer.StaminaWriteBuffer, "stage_last_used", stage_last_used)
+
+    asyncio.run(push._run_due_records([push.record_key(record)]))
+
+    assert [args[:3] for args in staged] == [(record.uid, record.user_id, record.bot_id)]
+    assert not direct
+    assert len(flushed) == 1 and len(flushed[0]) == 1